@@ -2,7 +2,7 @@ import argparse
 import sqlite3
 
 from src.core import APR, Prioritization
-from src.execution import Tester, Preprocess
+from src.execution import Results, Tester, Tracer, TraceStore, Preprocess, FaultLocalization
 from src.utils import Randoms, regularize, relative_patch_size, divide
 
 def make_query(cur, table, table_dict, foreign=None):
@@ -16,6 +16,12 @@ def make_query(cur, table, table_dict, foreign=None):
     _query = {key:None for key in table_dict.keys()}
     return query, _query
 
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'{value} is not a positive integer')
+    return number
+
 def save_db(con, cur, query, _query):
     cur.execute(query, _query)
     _query = {key:None for key in _query.keys()}
@@ -33,6 +39,32 @@ if __name__ == "__main__":
                         help="Number of generations, default is 10")
     parser.add_argument('-s', '--seed', type=int, default=None,
                         help="Set start of random seed value, default is None")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="Number of worker processes for running testcases, default is 1")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of worker processes evolving the individuals of a generation, default is 1")
+    parser.add_argument('--mates', type=positive_int, default=None,
+                        help="Number of candidate mates pre-filtered by trace similarity, default scores a random half of the population")
+    parser.add_argument('-m', '--memory', type=int, default=1024,
+                        help="Memory (MB) a candidate may allocate while running a testcase, default is 1024")
+    parser.add_argument('--no-sandbox', dest='sandbox', action='store_false',
+                        help="Run testcases with the unittest runner instead of the fork-server sandbox")
+    parser.add_argument('--tracer', choices=['auto', 'monitoring', 'settrace'], default='auto',
+                        help="Tracer backend of the sandbox, default is sys.monitoring if available (Python 3.12+)")
+    parser.add_argument('--vari-digest', action='store_true',
+                        help="Trace variable values as fixed-size digests with their type")
+    parser.add_argument('--vari-limit', type=int, default=None,
+                        help="Max number of values traced for each variable, default is unlimited")
+    parser.add_argument('--raw-trace', action='store_true',
+                        help="Keep full execution traces instead of line hit counts")
+    parser.add_argument('--rts', action='store_true',
+                        help="Regression test selection, children only run testcases reaching their modified statements")
+    parser.add_argument('--trace-store', nargs='?', const='trace.sqlite3', default=None,
+                        help="Reuse execution results of earlier runs kept in a SQLite file, default file is trace.sqlite3")
+    parser.add_argument('--trace-store-size', type=int, default=512,
+                        help="Max size (MB) of results kept in the trace store, default is 512")
+    parser.add_argument('--formula', choices=FaultLocalization.formulas, default='jaccard',
+                        help="Fault localization formula for choosing suspicious lines, default is jaccard")
     args = parser.parse_args()
 
 
@@ -42,6 +74,13 @@ if __name__ == "__main__":
     generations = args.generations
     seed = args.seed
     Randoms.seed = seed
+    Tracer.backend = args.tracer
+    Tracer.vari_digest = args.vari_digest
+    Tracer.vari_limit = args.vari_limit
+    Results.raw_trace = args.raw_trace
+    FaultLocalization.formula = args.formula
+    APR.jobs = args.jobs
+    APR.mates = args.mates
 
     # Set DB
     dbfile = 'db.sqlite3'
@@ -91,8 +130,9 @@ if __name__ == "__main__":
 
     """Running APR-Framework"""
     ## Preprocessing
-    tester = Tester(testcases, args.timeout)
-    preproc = Preprocess(tester)
+    store = TraceStore(args.trace_store, args.trace_store_size) if args.trace_store else None
+    tester = Tester(testcases, args.timeout, args.workers, args.sandbox, args.memory, store)
+    preproc = Preprocess(tester, args.rts)
     preproc.run(buggy_programs)
 
     ## Run APR-Framework
@@ -100,6 +140,7 @@ if __name__ == "__main__":
     solutions = apr.run(buggy_programs, pop_size=len(buggy_programs), generations=generations)
     prior = Prioritization(buggy_programs)
     patches = prior.run(solutions)
+    tester.close()
     
 
     """Save Results"""
@@ -151,4 +192,9 @@ if __name__ == "__main__":
     print(f'{len(patches)} Patches are generated.')
     print(f'Repair Rate: {round(success/len(buggy_programs), 2)*100}')
     print(f'AVG RPS: {avg_rps}')
+    print(f'Execution Cache: {preproc.cache_hits} hits, {preproc.cache_misses} misses')
+    if store is not None:
+        print(f'Trace Store: {store.hits} hits, {store.misses} misses')
+    if args.rts:
+        print(f'Regression Test Selection: {preproc.reused_tc} of {preproc.total_tc} testcases reused')
     con.close()
@@ -1,13 +1,13 @@
 import ast
 from tqdm import tqdm
-from ordered_set import OrderedSet
 import numpy as np
 import sqlite3
 import time
+import multiprocessing
 
-from ..execution import Preprocess, FaultLocalization
-from ..transform import VariableMap, SWTVariables, NodeMap, Fixer
-from ..utils import regularize, Randoms, divide
+from ..execution import Preprocess
+from ..transform import VariableMap, SWTVariables, NodeMap, EditScript
+from ..utils import regularize, Randoms, divide, get_unique_traces, LRUCache, MinHashLSH
 
 table_dict = {'run_id':'INTEGER NOT NULL',
                   'generation':'INTEGER NOT NULL',
@@ -25,11 +25,24 @@ table_dict = {'run_id':'INTEGER NOT NULL',
                   'patch':'TEXT',
                   'fitness':'REAL',
                   'solution':'BLOB',
-                  'time_sec':'REAL'}
+                  'time_sec':'REAL',
+                  'lcs_cache':'TEXT'}
 foreign = 'FOREIGN KEY (run_id) REFERENCES run(id)'
 
+# APR of the current generation, inherited by forked workers
+generation_apr = None
+
+
+def evolve_job(p_id_1:str) -> tuple:
+    return generation_apr.evolve_job(p_id_1)
+
 
 class APR:
+    # Number of worker processes evolving the individuals of a generation
+    jobs = 1
+    # Number of candidate mates pre-filtered by trace similarity, None scores a random half of the population
+    mates = None
+
     def __init__(self, preproc:Preprocess, dbfile:str, table:str='log', foreign_id=None):
         self.foreign_id = foreign_id
         self.con = sqlite3.connect(dbfile)
@@ -40,6 +53,13 @@ class APR:
         self.tester = preproc.tester
         self.solutions = dict()
         self.max_dist = self.distance_from_max_points(-1, -1)
+        # LCS lengths of trace pairs, by the node types of both traces
+        self.lcs_cache = LRUCache()
+        # Scores and trace similarities of the population, cleared when populations are swapped
+        self.fitness_cache = {}
+        self.trace_sims = {}
+        # LSH index of the population, built every generation if mates are pre-filtered
+        self.mate_index = None
 
     def __make_query(self, table):
         self.cur.execute(f'SELECT COUNT(*) FROM sqlite_master WHERE name="{table}"')
@@ -47,13 +67,22 @@ class APR:
             create_query = ", ".join([f'{key} {value}' for key, value in table_dict.items()])
             if foreign: create_query += f', {foreign}'
             self.cur.execute(f'CREATE TABLE {table} ({create_query});')
+        else:
+            # Columns added since the table was created
+            columns = [row[1] for row in self.cur.execute(f'PRAGMA table_info({table});')]
+            for key, value in table_dict.items():
+                if key not in columns:
+                    self.cur.execute(f'ALTER TABLE {table} ADD COLUMN {key} {value};')
         insert_query = ", ".join([f':{key}' for key in table_dict.keys()])
         self.query = f'INSERT INTO {table} VALUES({insert_query});'
-        self._query = {key:self.foreign_id if key == 'run_id' else None for key in table_dict.keys()}
+        self._query = self.__new_query()
+
+    def __new_query(self) -> dict:
+        return {key:self.foreign_id if key == 'run_id' else None for key in table_dict.keys()}
 
     def __save_db(self):
         self.cur.execute(self.query, self._query)
-        self._query = {key:self.foreign_id if key == 'run_id' else None for key in table_dict.keys()}
+        self._query = self.__new_query()
         self.con.commit()
 
     def population(self, pop_size:int, programs:dict) -> dict:
@@ -65,18 +94,38 @@ class APR:
     def distance_from_max_points(self, x, y):
         return np.sqrt((1 - x)**2 + (1 - y)**2)
     
+    def get_shingles(self, p_id:str) -> set:
+        # Outcome and ordered pairs of executed node types of every testcase
+        trace_hist = self.preproc.run_data[p_id][3]
+        artifact = self.preproc.get_artifact(p_id)
+        shingles = set()
+        for tc_no, passed in zip(self.tester.get_tc_no_list(), self.preproc.get_outcomes([p_id])[0].tolist()):
+            names = [node.__class__.__name__ for node in artifact.get_trace_nodes(get_unique_traces(trace_hist[tc_no]))]
+            shingles.add((tc_no, passed))
+            shingles.update((tc_no, name_1, name_2) for name_1, name_2 in zip([None] + names, names))
+        return shingles
+
+    def index_mates(self, populations:dict) -> MinHashLSH:
+        mate_index = MinHashLSH()
+        for p_id in populations.keys():
+            mate_index.insert(p_id, self.get_shingles(p_id))
+        return mate_index
+
     def selection(self, p_id_1:str, populations:dict) -> str:
         p2 = None
         # Exclude p1 from population
         # Random Sampling population
-        populations = {file:populations[file] 
-                       for file in Randoms.sample(list(populations.keys()), len(populations)//2)
-                       if file != p_id_1}
+        sample = [file for file in Randoms.sample(list(populations.keys()), len(populations)//2) if file != p_id_1]
+        if self.mates is not None:
+            # Candidates sharing LSH buckets with p1 first, the random sample fills the rest
+            candidates = self.mate_index.query(p_id_1, self.mates)
+            sample = candidates + [file for file in sample if file not in candidates][:self.mates - len(candidates)]
+        populations = {file:populations[file] for file in sample}
         
-        # Tournament Selection
+        # Tournament Selection, unit test scores of the candidates are computed at once
         max_score = 0
-        for p_id_2 in populations.keys():
-            score = self.fitness(p_id_1, p_id_2)
+        scores = self.fitness_scores(p_id_1, list(populations.keys()))
+        for p_id_2, score in zip(populations.keys(), scores):
             if score > max_score:
                 max_score = score
                 p2 = p_id_2
@@ -94,7 +143,7 @@ class APR:
         tree2 = ast.parse(parent2)
 
         # Variable Variants
-        tree2 = self.swt_variables(tree1, tree2, vari_hist1, vari_hist2)
+        tree2 = self.swt_variables(p_id_1, p_id_2, tree2, vari_hist1, vari_hist2)
 
         # Choice one random failed testcase for Exection Trace
         passed, failed = self.tester.split_test_hist(test_hist1)
@@ -104,14 +153,12 @@ class APR:
         self._query['testcase'] = self.tester.print_testcase(testcase)
         
         ## Ordered Set Exection Traces
-        traces1, traces2 = OrderedSet(trace_hist1[testcase]), OrderedSet(trace_hist2[testcase])
-        self._query['p1_trace'] = str(list(traces1))
-        self._query['p2_trace'] = str(list(traces2))
-
-        # FaultLocalization
-        fl = FaultLocalization()
-        suspiciousness = fl.run_core(test_hist1, trace_hist1, formula='jaccard')
-        suspicious = fl.get_fl_over_nscore(suspiciousness)
+        traces1, traces2 = get_unique_traces(trace_hist1[testcase]), get_unique_traces(trace_hist2[testcase])
+        self._query['p1_trace'] = str(traces1)
+        self._query['p2_trace'] = str(traces2)
+
+        # FaultLocalization, computed once when the program was traced
+        _, suspicious = self.preproc.get_fl_data(p_id_1)
         self._query['suspicious'] = str(suspicious)
         traces1 = [lineno for lineno in traces1 if lineno in suspicious]
 
@@ -125,9 +172,10 @@ class APR:
         self._query['patch'] = child
         return regularize(child)
     
-    def swt_variables(self, tree1, tree2, vari_hist1, vari_hist2):
+    def swt_variables(self, p_id_1, p_id_2, tree2, vari_hist1, vari_hist2):
         # Switch variables
-        var_map = VariableMap(self.tester.get_tc_no_list()).run(tree1, vari_hist1, tree2, vari_hist2)
+        var_map = VariableMap(self.tester.get_tc_no_list()).run(self.preproc.get_artifact(p_id_1), vari_hist1,
+                                                                self.preproc.get_artifact(p_id_2), vari_hist2)
         self._query['varmap'] = str(var_map)
         tree2 = SWTVariables(var_map).visit(tree2)
         return tree2
@@ -137,106 +185,207 @@ class APR:
         node_map = NodeMap.crossover(tree1, traces1, tree2, traces2)
         self._query['crossover'] = str([(act,n1.lineno,n2.lineno) for n1, (act,n2) in node_map.items()])
         # Uniform Crossover
-        tree1 = Fixer(node_map).visit(tree1)
+        tree1 = EditScript(node_map).run(tree1)
         return tree1
 
     def mutation(self, tree1, traces1, tree2, traces2) -> ast:
-        tree1 = ast.parse(ast.unparse(tree1))
+        # Line numbers of the crossed over tree, as if it was written and parsed again
+        tree1 = EditScript.renumber(tree1)
         node_map = NodeMap.mutation(tree1, traces1, tree2, traces2)
         self._query['mutation'] = str([(act, n1.lineno, n2.lineno 
                         if n2 is not None else n1.lineno)
                         for n1, (act, n2) in node_map.items()])
         # Mutation
-        tree1 = Fixer(node_map).visit(tree1)
+        tree1 = EditScript(node_map).run(tree1)
         return tree1
 
 
-    def fitness(self, p_id:str, c_id:str, child:str=None) -> float:
-        # parent
-        p_code, p_test_hist, p_vari_hist, p_trace_hist = self.preproc.run_data[p_id]
-        
-        # child
-        if c_id not in self.preproc.run_data.keys():
-            self.preproc.core_procs(c_id, child)
-        c_code, c_test_hist, c_vari_hist, c_trace_hist = self.preproc.run_data[c_id]
-        
-        # Unit Test Score
+    def trace_length(self, p_artifact, p_traces, c_artifact, c_traces) -> int:
+        # Testcases and programs with the same node types share one alignment
+        key = p_artifact.get_trace_symbols(p_traces), c_artifact.get_trace_symbols(c_traces)
+        lcs_trace = self.lcs_cache.get(key)
+        if lcs_trace is None:
+            lcs_trace = NodeMap.trace_length(p_artifact, p_traces, c_artifact, c_traces)
+            self.lcs_cache.put(key, lcs_trace)
+        return lcs_trace
+
+    def ut_scores(self, p_ids:list, c_ids:list) -> np.ndarray:
+        # Unit test scores of every parent (rows) against every candidate (columns)
+        p_pass = self.preproc.get_outcomes(p_ids)[:, None, :]
+        c_pass = self.preproc.get_outcomes(c_ids)[None, :, :]
         T = len(self.tester.testsuite)
-        p_pass, p_fail = self.tester.split_test_hist(p_test_hist)
-        c_pass, c_fail = self.tester.split_test_hist(c_test_hist)
-        fp = set(p_fail) & set(c_pass)
-        pp = set(p_pass) & set(c_pass)
-        ff = set(p_fail) & set(c_fail)
-        pf = set(p_pass) & set(c_fail)
-        ut_score = (len(fp) + len(pp)*(T-1)/T + len(ff)*(1-T)/T - len(pf)) / T
-
-        # Execution Trace Score
-        et_score = 0
+        fp = (~p_pass & c_pass).sum(axis=2)
+        pp = (p_pass & c_pass).sum(axis=2)
+        ff = (~p_pass & ~c_pass).sum(axis=2)
+        pf = (p_pass & ~c_pass).sum(axis=2)
+        return (fp + pp*(T-1)/T + ff*(1-T)/T - pf) / T
+
+    def get_trace_sims(self, p_id:str, c_id:str, memo:bool=True) -> list:
+        # Trace similarity of each testcase, the same for both orders of a pair
+        key = (p_id, c_id) if p_id <= c_id else (c_id, p_id)
+        if memo and key in self.trace_sims.keys():
+            return self.trace_sims[key]
+        p_trace_hist = self.preproc.run_data[p_id][3]
+        c_trace_hist = self.preproc.run_data[c_id][3]
+        p_artifact = self.preproc.get_artifact(p_id)
+        c_artifact = self.preproc.get_artifact(c_id)
+        trace_sims = []
         for tc_no in self.tester.get_tc_no_list():
-            p_traces = OrderedSet(p_trace_hist[tc_no])
-            c_traces = OrderedSet(c_trace_hist[tc_no])
+            p_traces = get_unique_traces(p_trace_hist[tc_no])
+            c_traces = get_unique_traces(c_trace_hist[tc_no])
             
-            trace_map = NodeMap.trace(p_code, p_traces, c_code, c_traces)
-            lcs_trace = len(trace_map)
+            lcs_trace = self.trace_length(p_artifact, p_traces, c_artifact, c_traces)
             max_trace = max(len(p_traces), len(c_traces))
-            trace_sim = divide(lcs_trace, max_trace)
-
-            if tc_no in fp:
-                et_score += trace_sim
-            elif tc_no in pp:
-                et_score += trace_sim*(T-1)/T
-            elif tc_no in ff:
-                et_score += trace_sim*(1-T)/T
-            else:
-                et_score -= trace_sim
-        et_score = divide(et_score, T)
+            trace_sims.append(divide(lcs_trace, max_trace))
+        if memo: self.trace_sims[key] = trace_sims
+        return trace_sims
 
-        # Fitness Score
-        score = self.max_dist - self.distance_from_max_points(ut_score, et_score)
-        return score
+    def fitness_scores(self, p_id:str, c_ids:list, memo:bool=True) -> list:
+        # Programs of the population keep their run data for the generation, a new child is not memoized
+        scores = {c_id:self.fitness_cache[p_id, c_id] 
+                  for c_id in c_ids if memo and (p_id, c_id) in self.fitness_cache.keys()}
+        todo = [c_id for c_id in c_ids if c_id not in scores.keys()]
+        if not todo:
+            return [scores[c_id] for c_id in c_ids]
 
+        # Unit Test Score, for every candidate at once
+        T = len(self.tester.testsuite)
+        ut_scores = self.ut_scores([p_id], todo)[0]
 
-    def run(self, programs:dict, pop_size:int=2, generations:int=50):
-        populations = self.population(pop_size, programs)
-        for generation in tqdm(range(1, generations+1), desc='Generation'):
-            descendant = {}
-            for p_id_1 in tqdm(populations.keys(), total=len(populations), desc='Popul', leave=False):
-                start_time = time.process_time()
+        p_pass = self.preproc.get_outcomes([p_id])[0].tolist()
+        for c_id, ut_score, c_pass in zip(todo, ut_scores, self.preproc.get_outcomes(todo).tolist()):
+            # Execution Trace Score
+            et_score = 0
+            for trace_sim, p_ok, c_ok in zip(self.get_trace_sims(p_id, c_id, memo), p_pass, c_pass):
+                if c_ok and not p_ok:
+                    et_score += trace_sim
+                elif c_ok:
+                    et_score += trace_sim*(T-1)/T
+                elif not p_ok:
+                    et_score += trace_sim*(1-T)/T
+                else:
+                    et_score -= trace_sim
+            et_score = divide(et_score, T)
 
-                self._query['generation'] = generation
-                origin_p_id = p_id_1.rsplit("_", 1)[0]
-                c_id = f'{origin_p_id}_{generation}'
+            # Fitness Score
+            scores[c_id] = self.max_dist - self.distance_from_max_points(ut_score, et_score)
+            if memo: self.fitness_cache[p_id, c_id] = scores[c_id]
+        return [scores[c_id] for c_id in c_ids]
 
-                # Select mate parent
-                p_id_2 = self.selection(p_id_1, populations)
-                self._query['p1_id'] = p_id_1
-                self._query['p2_id'] = p_id_2
+    def fitness(self, p_id:str, c_id:str, child:str=None) -> float:
+        # child
+        if c_id not in self.preproc.run_data.keys():
+            self.preproc.core_procs(c_id, child, p_id)
+        return self.fitness_scores(p_id, [c_id], memo=child is None)[0]
 
-                # Modification
-                child = self.modification(p_id_1, p_id_2)
 
-                # Calculate Fitness Score
-                p_id = f'{p_id_1.rsplit("_", 1)[0]}_{generation-1}'
-                p_score = self.fitness(p_id, p_id_1)
-                c_score = self.fitness(p_id_1, c_id, child)
-                self._query['fitness'] = c_score
+    def evolve(self, generation:int, p_id_1:str, populations:dict) -> tuple:
+        # Child of p_id_1 in the generation, and the program passed to the next generation
+        start_time = time.process_time()
 
-                # Add solutions
-                test_hist = self.preproc.run_data[c_id][1]
-                if self.tester.is_all_pass(test_hist):
-                    self.solutions.setdefault(origin_p_id, {})[generation] = child
-                self._query['solution'] = self.tester.is_all_pass(test_hist)
+        self._query['generation'] = generation
+        origin_p_id = p_id_1.rsplit("_", 1)[0]
+        c_id = f'{origin_p_id}_{generation}'
+
+        # Select mate parent
+        p_id_2 = self.selection(p_id_1, populations)
+        self._query['p1_id'] = p_id_1
+        self._query['p2_id'] = p_id_2
+
+        # Modification
+        child = self.modification(p_id_1, p_id_2)
+
+        # Calculate Fitness Score
+        p_id = f'{p_id_1.rsplit("_", 1)[0]}_{generation-1}'
+        p_score = self.fitness(p_id, p_id_1)
+        c_score = self.fitness(p_id_1, c_id, child)
+        self._query['fitness'] = c_score
+
+        # Add solutions
+        solution = None
+        test_hist = self.preproc.run_data[c_id][1]
+        if self.tester.is_all_pass(test_hist):
+            # Testcases skipped by regression test selection are run before it is a solution
+            test_hist = self.preproc.validate(c_id)
+        if self.tester.is_all_pass(test_hist):
+            solution = child
+        self._query['solution'] = self.tester.is_all_pass(test_hist)
+
+        # Select next generation
+        if p_score > c_score:
+            child = self.preproc.run_data[p_id][0]
+            self.preproc.core_procs(c_id, child)
+
+        self._query['time_sec'] = time.process_time() - start_time
+        return c_id, child, solution
 
-                # Select next generation
-                if p_score > c_score:
-                    child = self.preproc.run_data[p_id][0]
-                    self.preproc.core_procs(c_id, child)
+    def get_counters(self) -> list:
+        # Statistics counted in every worker
+        counters = [(self.preproc, 'cache_hits'), (self.preproc, 'cache_misses'),
+                    (self.preproc, 'reused_tc'), (self.preproc, 'total_tc'),
+                    (self.lcs_cache, 'hits'), (self.lcs_cache, 'misses')]
+        if self.tester.store is not None:
+            counters += [(self.tester.store, 'hits'), (self.tester.store, 'misses')]
+        return counters
+
+    def evolve_job(self, p_id_1:str) -> tuple:
+        # Worker process, the individual is evolved from the state at the start of the generation
+        counts = [getattr(obj, name) for obj, name in self.get_counters()]
+        self.preproc.journal = {}
+        result = self.evolve(self.generation, p_id_1, self.populations)
+        state = self.preproc.get_state(result[0])
+        self.preproc.journal = None
+        counts = [getattr(obj, name) - count for (obj, name), count in zip(self.get_counters(), counts)]
+        query, self._query = self._query, self.__new_query()
+        return result, query, state, counts
+
+    def evolve_all(self, generation:int, populations:dict):
+        # Individuals are evolved by a pool forked for the generation, and merged in population order
+        global generation_apr
+        generation_apr = self
+        self.generation, self.populations = generation, populations
+        context = multiprocessing.get_context('fork')
+        with context.Pool(min(self.jobs, len(populations))) as pool:
+            jobs = pool.map(evolve_job, list(populations.keys()), chunksize=1)
+        generation_apr = None
+
+        # Histories written by earlier individuals, an individual using one of them is evolved again
+        written = set()
+        for p_id_1, (result, query, state, counts) in zip(populations.keys(), jobs):
+            journal = state['journal']
+            if written.isdisjoint(journal.keys()):
+                self.preproc.set_state(result[0], state)
+                for (obj, name), count in zip(self.get_counters(), counts):
+                    setattr(obj, name, getattr(obj, name) + count)
+                self._query.update(query)
+            else:
+                self.preproc.journal = {}
+                result = self.evolve(generation, p_id_1, populations)
+                journal, self.preproc.journal = self.preproc.journal, None
+            written.update(key for key, is_written in journal.items() if is_written)
+            yield result
+
+    def run(self, programs:dict, pop_size:int=2, generations:int=50):
+        populations = self.population(pop_size, programs)
+        progress = tqdm(range(1, generations+1), desc='Generation')
+        for generation in progress:
+            descendant = {}
+            if self.mates is not None:
+                self.mate_index = self.index_mates(populations)
+            if self.jobs > 1 and len(populations) > 1:
+                evolved = self.evolve_all(generation, populations)
+            else:
+                evolved = (self.evolve(generation, p_id_1, populations) for p_id_1 in populations.keys())
+            for c_id, child, solution in tqdm(evolved, total=len(populations), desc='Popul', leave=False):
+                # Add solutions
+                if solution is not None:
+                    self.solutions.setdefault(c_id.rsplit("_", 1)[0], {})[generation] = solution
 
                 # Add descendant
                 descendant[c_id] = child
                 
-                # Save DB
-                self._query['time_sec'] = time.process_time() - start_time
+                # Save DB, with the LCS cache statistics so far
+                self._query['lcs_cache'] = self.lcs_cache.stats()
                 self.__save_db()
 
             # Initialize Population
@@ -248,6 +397,9 @@ class APR:
                                         for i, j in v.items() 
                                         if i not in populations.keys()} 
                                         for k, v in self.preproc.trace_data.items()}
+            self.preproc.clean_artifacts()
+            self.preproc.clean_outcomes()
+            self.fitness_cache, self.trace_sims = {}, {}
             populations = descendant
+            progress.set_postfix_str(f'LCS cache: {self.lcs_cache.stats()}')
         return self.solutions
-    
\ No newline at end of file
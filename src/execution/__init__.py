@@ -1,6 +1,12 @@
 from .results import Results
 from .tester import Tester
+from .pool import TestPool
+from .sandbox import Sandbox, SandboxServer
+from .supervisor import Supervisor
+from .session import TestSession
+from .store import TraceStore
 from .unittests import Running, Tracing, RunUnitTest
-from .tracer import Tracer
+from .tracer import Tracer, MonitoringTracer
+from .spectrum import Spectrum
 from .faultLocalization import FaultLocalization
 from .preprocess import Preprocess
@@ -1,6 +1,14 @@
+import numpy as np
+
 from .tester import Tester
+from .spectrum import Spectrum
 
 class FaultLocalization:
+    # Formula used when none is given, set from run.py
+    formula = 'jaccard'
+    formulas = ('jaccard', 'tarantula', 'ochiai', 'dstar', 'op2')
+    aliases = {'trantula':'tarantula'}
+
     def __init__(self, success:str='Success'):
         self.__success = success
 
@@ -12,76 +20,38 @@ class FaultLocalization:
         fl_list = [lineno for lineno, score in suspiciousness.items() if score > n]
         return fl_list
 
-    def trantula(self, test_hist:dict, trace_hist:dict) -> dict:
-        total_pass = 0
-        total_fail = 0
-        pass_cnt_dict = {}
-        fail_cnt_dict = {}
-        lines = set()
+    def tarantula(self, spectrum:Spectrum) -> np.ndarray:
+        fail_ratio = spectrum.divide(spectrum.ef, spectrum.total_fail)
+        pass_ratio = spectrum.divide(spectrum.ep, spectrum.total_pass)
+        return spectrum.divide(fail_ratio, fail_ratio + pass_ratio)
 
-        for testcase_no, status in test_hist.items():
-            for lineno in set(trace_hist[testcase_no]):
-                lines.add(lineno)
-                if status != self.__success:
-                    total_fail += 1
-                    fail_cnt_dict.setdefault(lineno, 0)
-                    fail_cnt_dict[lineno] += 1
-                else:
-                    total_pass += 1
-                    pass_cnt_dict.setdefault(lineno, 0)
-                    pass_cnt_dict[lineno] += 1
-        
-        suspiciousness = {}
-        for lineno in lines:
-            pass_cnt = pass_cnt_dict[lineno] if lineno in pass_cnt_dict.keys() else 0
-            fail_cnt = fail_cnt_dict[lineno] if lineno in fail_cnt_dict.keys() else 0
-            score = 0
-            try: score = round((fail_cnt / total_fail) / ((fail_cnt / total_fail) + (pass_cnt / total_pass)), 1)
-            except ZeroDivisionError:
-                if fail_cnt > 0 and pass_cnt == 0:
-                    score = 1
-            suspiciousness[lineno] = score
-        
-        return suspiciousness
-    
-    def jaccard(self, test_hist:dict, trace_hist:dict) -> dict:
-        total_fail = 0
-        exec_cnt_dict = {}
-        fail_cnt_dict = {}
-        lines = set()
+    def jaccard(self, spectrum:Spectrum) -> np.ndarray:
+        return spectrum.divide(spectrum.ef, spectrum.ef + spectrum.ep + spectrum.nf)
 
-        for testcase_no, status in test_hist.items():
-            if status != self.__success:
-                total_fail += 1
-            for lineno in set(trace_hist[testcase_no]):
-                lines.add(lineno)
-                exec_cnt_dict.setdefault(lineno, 0)
-                exec_cnt_dict[lineno] += 1
-                if status != self.__success:
-                    fail_cnt_dict.setdefault(lineno, 0)
-                    fail_cnt_dict[lineno] += 1
-        
-        suspiciousness = {}
-        for lineno in lines:
-            exec_cnt = exec_cnt_dict[lineno] if lineno in exec_cnt_dict.keys() else 0
-            fail_cnt = fail_cnt_dict[lineno] if lineno in fail_cnt_dict.keys() else 0
-            score = 0
-            try: score = round((fail_cnt / (exec_cnt + (total_fail - fail_cnt))), 1)
-            except ZeroDivisionError:
-                if fail_cnt > 0 and exec_cnt == 0:
-                    score = 1
-            suspiciousness[lineno] = score
-        
-        return suspiciousness
-    
-    def run_core(self, test_hist:dict, trace_hist:dict, formula:str="jaccard") -> dict:
-        if formula == "trantula":
-            suspiciousness = self.trantula(test_hist, trace_hist)
-        elif formula == "jaccard":
-            suspiciousness = self.jaccard(test_hist, trace_hist)
-        return suspiciousness
+    def ochiai(self, spectrum:Spectrum) -> np.ndarray:
+        return spectrum.divide(spectrum.ef, np.sqrt(spectrum.total_fail * (spectrum.ef + spectrum.ep)))
+
+    def dstar(self, spectrum:Spectrum, star:int=2) -> np.ndarray:
+        # Lines executed by failed testcases only are the most suspicious
+        default = np.where(spectrum.ef > 0, np.inf, 0)
+        scores = spectrum.divide(spectrum.ef ** star, spectrum.ep + spectrum.nf)
+        return np.where(spectrum.ep + spectrum.nf == 0, default, scores)
+
+    def op2(self, spectrum:Spectrum) -> np.ndarray:
+        return spectrum.ef - spectrum.ep / (spectrum.total_pass + 1)
+
+    def get_scores(self, spectrum:Spectrum, formula:str=None) -> np.ndarray:
+        formula = formula or self.formula
+        formula = self.aliases.get(formula, formula)
+        if formula not in self.formulas:
+            raise ValueError(f'Unknown formula: {formula}')
+        return getattr(self, formula)(spectrum)
+
+    def run_core(self, test_hist:dict, trace_hist:dict, formula:str=None) -> dict:
+        spectrum = Spectrum(test_hist, trace_hist, self.__success)
+        return spectrum.to_dict(self.get_scores(spectrum, formula))
     
-    def run(self, code:str, tester:Tester, formula:str="jaccard") -> dict:
+    def run(self, code:str, tester:Tester, formula:str=None) -> dict:
         test_hist, _, trace_hist = tester.trace(code)
         suspiciousness = self.run_core(test_hist, trace_hist, formula)
         return suspiciousness
\ No newline at end of file
@@ -0,0 +1,52 @@
+import math
+import multiprocessing
+
+# Tester of the current worker process, inherited through fork
+worker_tester = None
+
+
+def init_worker(tester):
+    global worker_tester
+    worker_tester = tester
+
+
+def run_job(job:tuple) -> list:
+    key, code, testcases, tracing = job
+    return key, worker_tester.run_testcases(code, testcases, tracing)
+
+
+class TestPool:
+    def __init__(self, tester, workers:int=2):
+        self.tester = tester
+        self.workers = workers
+        self.pool = None
+
+    def __get_pool(self):
+        # Workers are forked lazily so that they inherit every loaded module
+        if self.pool is None:
+            context = multiprocessing.get_context('fork')
+            self.pool = context.Pool(self.workers, initializer=init_worker, initargs=(self.tester,))
+        return self.pool
+
+    def __make_jobs(self, programs:dict, testcases:list, tracing:bool) -> list:
+        # Split every program into chunks of testcases, (program, testcase) pairs are balanced over workers
+        total = len(programs) * len(testcases)
+        chunk_size = max(1, math.ceil(total / (self.workers * 4)))
+        jobs = []
+        for key, code in programs.items():
+            for start in range(0, len(testcases), chunk_size):
+                jobs.append((key, code, testcases[start:start+chunk_size], tracing))
+        return jobs
+
+    def map(self, programs:dict, testcases:list, tracing:bool=False) -> dict:
+        results = {key:[] for key in programs.keys()}
+        jobs = self.__make_jobs(programs, testcases, tracing)
+        for key, chunk in self.__get_pool().imap(run_job, jobs):
+            results[key].extend(chunk)
+        return results
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
@@ -1,27 +1,130 @@
-import ast
-from tqdm import tqdm
+import hashlib
+import numpy as np
 
 from .tester import Tester
-from ..utils import regularize
-from ..transform import NodeMap
+from .selection import TestSelection
+from .faultLocalization import FaultLocalization
+from ..utils import regularize, LRUCache
+from ..transform import ProgramArtifact
 
 
 class Preprocess:
-    def __init__(self, tester:Tester):
+    # Max number of programs kept in the caches, evicted ones are run again if they come back
+    cache_size = 4096
+
+    def __init__(self, tester:Tester, rts:bool=False):
         self.tester = tester
+        # Regression test selection, children only run testcases reaching their modified statements
+        self.rts = rts
+        self.selection = TestSelection()
+        # Keys of histories with results reused from a parent, they are validated before being a solution
+        self.selected = set()
+        self.reused_tc = 0
+        self.total_tc = 0
 
         self.run_data = {}
         self.trace_data = {}
+        # Parsed views of programs with run data, keyed like the cache
+        self.artifacts = {}
+        # Suspiciousness and suspicious lines of each program, keyed like the cache
+        self.fl = FaultLocalization()
+        self.fl_data = LRUCache(self.cache_size)
+        # Outcome matrix (program x testcase), True if the testcase passed, rows are given out like a list
+        self.outcomes = np.zeros((0, len(self.tester.get_tc_no_list())), dtype=bool)
+        self.outcome_rows = {}
+
+        # Histories of programs run, keyed by their regularized code
+        self.cache = LRUCache(self.cache_size)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Keys of histories used while the journal is on, True if the history was (re)written
+        self.journal = None
+
+
+    def get_key(self, code:str) -> str:
+        return hashlib.blake2b(code.encode(), digest_size=16).hexdigest()
+
+    def log_key(self, key:str, written:bool=False):
+        if self.journal is not None:
+            self.journal[key] = self.journal.get(key, False) or written
 
+    def get_selected_run_data(self, key:str, code:str, base_id:str) -> tuple:
+        # Results of testcases not reaching any modified statement are reused from the base program
+        base_code, base_test_hist, base_vari_hist, base_trace_hist = self.run_data[base_id]
+        selection = self.selection.run(base_code, base_test_hist, base_trace_hist, code)
+        tc_no_list = self.tester.get_tc_no_list()
+        self.total_tc += len(tc_no_list)
+        if selection is None:
+            return self.tester.trace(code)
+        selected, line_map = selection
+        self.reused_tc += len(tc_no_list) - len(selected)
+        if len(selected) == len(tc_no_list):
+            return self.tester.trace(code)
 
-    def get_run_data(self, code:str):
+        test_hist, vari_hist, trace_hist = self.tester.trace(code, selected) if selected else ({}, {}, {})
+        for tc_no in tc_no_list:
+            if tc_no not in selected:
+                test_hist[tc_no] = base_test_hist[tc_no]
+                vari_hist[tc_no] = base_vari_hist[tc_no]
+                trace_hist[tc_no] = self.selection.remap_traces(base_trace_hist[tc_no], line_map)
+        self.selected.add(key)
+        return ({tc_no:test_hist[tc_no] for tc_no in tc_no_list},
+                {tc_no:vari_hist[tc_no] for tc_no in tc_no_list},
+                {tc_no:trace_hist[tc_no] for tc_no in tc_no_list})
+
+    def get_run_data(self, code:str, base_id:str=None):
         code = regularize(code)
-        test_hist, vari_hist, trace_hist = self.tester.trace(code)
+        key = self.get_key(code)
+        run_data = self.cache.get(key)
+        if run_data is not None:
+            self.cache_hits += 1
+            self.log_key(key)
+        else:
+            self.cache_misses += 1
+            # An evicted history is run again, results it reused are dropped with it
+            self.selected.discard(key)
+            if self.rts and base_id in self.run_data.keys():
+                run_data = self.get_selected_run_data(key, code, base_id)
+            else:
+                run_data = self.tester.trace(code)
+            self.cache.put(key, run_data)
+            self.log_key(key, written=True)
+        test_hist, vari_hist, trace_hist = run_data
         return code, test_hist, vari_hist, trace_hist
     
+    def get_artifact(self, p_id:str) -> ProgramArtifact:
+        code = self.run_data[p_id][0]
+        key = self.get_key(code)
+        if key not in self.artifacts.keys():
+            self.artifacts[key] = ProgramArtifact(code)
+        return self.artifacts[key]
+
+    def clean_artifacts(self):
+        # Artifacts of programs without run data are dropped, they are rebuilt if the program comes back
+        keys = {self.get_key(code) for code, _, _, _ in self.run_data.values()}
+        self.artifacts = {key:artifact for key, artifact in self.artifacts.items() if key in keys}
+
+    def set_outcomes(self, p_id:str, test_hist:dict):
+        if p_id not in self.outcome_rows.keys():
+            if len(self.outcome_rows) == len(self.outcomes):
+                grown = np.zeros((max(2*len(self.outcomes), 16), self.outcomes.shape[1]), dtype=bool)
+                grown[:len(self.outcomes)] = self.outcomes
+                self.outcomes = grown
+            self.outcome_rows[p_id] = len(self.outcome_rows)
+        self.outcomes[self.outcome_rows[p_id]] = [test_hist[tc_no] == 'Success' 
+                                                  for tc_no in self.tester.get_tc_no_list()]
+
+    def get_outcomes(self, p_ids:list) -> np.ndarray:
+        return self.outcomes[[self.outcome_rows[p_id] for p_id in p_ids]]
+
+    def clean_outcomes(self):
+        # Rows of programs without run data are dropped, the others are packed in order
+        p_ids = [p_id for p_id in self.outcome_rows.keys() if p_id in self.run_data.keys()]
+        self.outcomes = self.get_outcomes(p_ids)
+        self.outcome_rows = {p_id:row for row, p_id in enumerate(p_ids)}
+
     def make_trace_data(self, p_id:str, code:str, test_hist:dict, trace_hist:dict):
-        tree = ast.parse(code)
-        line_node_map = NodeMap.get_line_node_map(tree)
+        line_node_map = self.get_artifact(p_id).line_node_map
         for testcase_no, result in test_hist.items():
             if result == 'Success':
                 self.trace_data.setdefault(testcase_no, {})[p_id] = [
@@ -30,16 +133,94 @@ class Preprocess:
                     if line in line_node_map.keys()]
 
 
-    def core_procs(self, p_id:str, code:str):
+    def make_fl_data(self, code:str, test_hist:dict, trace_hist:dict) -> tuple[dict, list]:
+        key = self.get_key(code)
+        fl_data = self.fl_data.get(key)
+        if fl_data is None:
+            suspiciousness = self.fl.run_core(test_hist, trace_hist)
+            fl_data = suspiciousness, self.fl.get_fl_over_nscore(suspiciousness)
+            self.fl_data.put(key, fl_data)
+        return fl_data
+
+    def get_fl_data(self, p_id:str) -> tuple[dict, list]:
+        # Computed again from the run data if it was evicted
+        code, test_hist, _, trace_hist = self.run_data[p_id]
+        return self.make_fl_data(code, test_hist, trace_hist)
+
+    def save_run_data(self, p_id:str, code:str, test_hist:dict, vari_hist:dict, trace_hist:dict):
         # Run Data
-        code, test_hist, vari_hist, trace_hist = self.get_run_data(code)
         self.run_data[p_id] = code, test_hist, vari_hist, trace_hist
+        self.set_outcomes(p_id, test_hist)
+
+        # Fault Localization
+        self.make_fl_data(code, test_hist, trace_hist)
 
         # Trace Data
         self.make_trace_data(p_id, code, test_hist, trace_hist)
 
+    def core_procs(self, p_id:str, code:str, base_id:str=None):
+        self.save_run_data(p_id, *self.get_run_data(code, base_id))
+
+    def validate(self, p_id:str) -> dict:
+        # Run every testcase of a program with reused results
+        code = self.run_data[p_id][0]
+        key = self.get_key(code)
+        self.log_key(key, written=key in self.selected)
+        if key in self.selected:
+            self.selected.remove(key)
+            run_data = self.tester.trace(code)
+            self.cache.put(key, run_data)
+            self.fl_data.pop(key)
+            self.save_run_data(p_id, code, *run_data)
+        return self.run_data[p_id][1]
+
+    def get_state(self, p_id:str) -> dict:
+        # Data of p_id and histories in the journal, to be merged into another process
+        # Histories evicted in the meantime are left out, they are run again if they come back
+        journal = self.journal
+        cache = {key:self.cache.data[key] 
+                 for key, written in journal.items() if written and key in self.cache.data.keys()}
+        return {'journal': journal,
+                'cache': cache,
+                'selected': {key:key in self.selected for key in journal.keys()},
+                'fl_data': {key:self.fl_data.data[key] for key in journal.keys() if key in self.fl_data.data.keys()},
+                'run_data': self.run_data[p_id],
+                'trace_data': {testcase_no:p_traces[p_id] 
+                               for testcase_no, p_traces in self.trace_data.items() 
+                               if p_id in p_traces.keys()}}
+
+    def set_state(self, p_id:str, state:dict):
+        for key, run_data in state['cache'].items():
+            self.cache.put(key, run_data)
+        for key, selected in state['selected'].items():
+            if selected: self.selected.add(key)
+            else: self.selected.discard(key)
+        for key, fl_data in state['fl_data'].items():
+            self.fl_data.put(key, fl_data)
+        self.run_data[p_id] = state['run_data']
+        self.set_outcomes(p_id, state['run_data'][1])
+        for testcase_no, traces in state['trace_data'].items():
+            self.trace_data.setdefault(testcase_no, {})[p_id] = traces
+
     def run(self, programs:dict):
-        # Preprocessing Run Data
-        for p_id, code in tqdm(programs.items(), total=len(programs), desc='Procs', leave=False):
-            self.core_procs(f'{p_id}_0', code)
+        # Preprocessing Run Data, all (program, testcase) pairs are traced at once
+        programs = {f'{p_id}_0':regularize(code) for p_id, code in programs.items()}
+        keys = {p_id:self.get_key(code) for p_id, code in programs.items()}
+        run_data = {}
+        misses = {}
+        for p_id, code in programs.items():
+            key = keys[p_id]
+            if key not in run_data.keys() and key not in misses.keys():
+                cached = self.cache.get(key)
+                if cached is None:
+                    self.cache_misses += 1
+                    misses[key] = code
+                    continue
+                run_data[key] = cached
+            self.cache_hits += 1
+        for key, data in self.tester.trace_all(misses).items():
+            self.cache.put(key, data)
+            run_data[key] = data
+        for p_id, code in programs.items():
+            self.save_run_data(p_id, code, *run_data[keys[p_id]])
 
@@ -1,7 +1,10 @@
 class Results:
-    exec_traces = []
+    # Full execution traces instead of line hit counts
+    raw_trace = False
+    exec_traces = {}
     vari_traces = {}
     vari_names = []
+    loc = None
     status = None
     timeout = 1
     test_code = ''
@@ -10,11 +13,17 @@ class Results:
     output = None
     globals = None
 
+    @classmethod
+    def get_empty_traces(cls):
+        # Line hit counts, or every executed line if raw traces are kept
+        return [] if cls.raw_trace else {}
+
     @classmethod
     def init_global_vars(cls):
-        cls.exec_traces = []
+        cls.exec_traces = cls.get_empty_traces()
         cls.vari_traces = {}
         cls.vari_names = []
+        cls.loc = None
         cls.status = None
         cls.timeout = 1
         cls.test_code = ''
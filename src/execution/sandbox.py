@@ -0,0 +1,114 @@
+import io
+import os
+import sys
+import builtins
+import multiprocessing
+
+from .results import Results
+from .tracer import get_tracer
+from .supervisor import Timeout
+from .session import TestSession
+
+
+class Sandbox:
+    def __init__(self, tester):
+        self.tester = tester
+
+    def get_builtins(self, stdin:io.StringIO) -> dict:
+        # Same behavior as the mocked input() and open() of unittests
+        def _input(prompt=''):
+            line = stdin.readline()
+            if not line:
+                raise EOFError
+            return line
+
+        def _open(*args, **kwargs):
+            return io.StringIO(Results.input_tc)
+
+        sandbox_builtins = dict(vars(builtins))
+        sandbox_builtins['input'] = _input
+        sandbox_builtins['open'] = _open
+        return sandbox_builtins
+
+    def execute(self, session:TestSession, testcase:dict, tracing:bool=False) -> tuple:
+        Results.init_global_vars()
+        self.tester.prepare(session, testcase)
+
+        stdin = io.StringIO(Results.input_tc)
+        stdout = io.StringIO()
+        backup = sys.stdin, sys.stdout, sys.stderr
+        sys.stdin, sys.stdout, sys.stderr = stdin, stdout, io.StringIO()
+        namespace = {'__name__':'__main__', '__builtins__':self.get_builtins(stdin)}
+
+        try:
+            # Definitions run untraced, their lines come before the testcase anyway
+            session.get_snapshot()
+            if tracing:
+                tracer = get_tracer(session.get_code_objects(Results.input_tc))
+                tracer.runfunc(session.execute, namespace, Results.input_tc)
+            else:
+                session.execute(namespace, Results.input_tc)
+        except Timeout:
+            Results.status = 'Timed Out'
+        except BaseException:
+            pass
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = backup
+
+        output = stdout.getvalue().strip()
+        if Results.status is None:
+            Results.status = 'Success' if output == Results.output_tc else 'Failure'
+        return Results.status, Results.vari_traces, Results.exec_traces
+
+    def run(self, session:TestSession, testcases:list, tracing:bool=False) -> list:
+        execute = lambda testcase: self.execute(session, testcase, tracing)
+        failed = lambda status: (status, {}, Results.get_empty_traces())
+        return self.tester.supervisor.run(testcases, execute, failed)
+
+
+class SandboxServer:
+    def __init__(self, tester):
+        self.tester = tester
+        self.pid = None
+        self.conn = None
+
+    def __serve(self, conn):
+        # Forked server, it never returns into the caller's stack whatever happens
+        try:
+            while True:
+                try: request = conn.recv()
+                except EOFError: break
+                if request is None: break
+                programs, testcases, tracing = request
+                conn.send({key:self.tester.run_testcases(code, testcases, tracing)
+                           for key, code in programs.items()})
+        finally:
+            os._exit(0)
+
+    def start(self):
+        # Pre-fork the server while the process is still small and everything is imported
+        conn, server_conn = multiprocessing.Pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                conn.close()
+                self.__serve(server_conn)
+            finally:
+                os._exit(0)
+        server_conn.close()
+        self.pid = pid
+        self.conn = conn
+
+    def map(self, programs:dict, testcases:list, tracing:bool=False) -> dict:
+        if self.pid is None:
+            self.start()
+        self.conn.send((programs, testcases, tracing))
+        return self.conn.recv()
+
+    def close(self):
+        if self.pid is not None:
+            self.conn.send(None)
+            self.conn.close()
+            os.waitpid(self.pid, 0)
+            self.pid = None
+            self.conn = None
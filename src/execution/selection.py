@@ -0,0 +1,171 @@
+import ast
+import types
+import difflib
+
+from ..transform import NodeParser
+from ..utils import get_stmt_list, get_indentation
+
+
+class TestSelection:
+    # Clauses without line events, they run after an earlier line of their statement
+    silent_clauses = ('else:', 'finally:', 'except')
+    # Statuses of testcases whose traces cover every executed line
+    traced_statuses = ('Success', 'Failure')
+
+    def get_body_lines(self, tree:ast.Module) -> dict:
+        # Lines of each function body, by the line of its definition
+        body_lines = {}
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                body_lines[node.lineno] = set(range(node.body[0].lineno, node.body[-1].end_lineno + 1))
+        return body_lines
+
+    def get_code_objects(self, code:types.CodeType) -> dict:
+        code_objects = {}
+        stack = [code]
+        while stack:
+            code = stack.pop()
+            if isinstance(code, types.CodeType):
+                code_objects.setdefault(code.co_qualname, []).append(code)
+                stack.extend(code.co_consts)
+        return code_objects
+
+    def get_code_lines(self, code_objects:list) -> set:
+        # Lines of code objects and the functions nested in them
+        lines = set()
+        for code_object in code_objects:
+            for codes in self.get_code_objects(code_object).values():
+                for code in codes:
+                    lines.update(lineno for _, _, lineno in code.co_lines() if lineno is not None)
+        return lines
+
+    def is_same_scope(self, a_code:types.CodeType, b_code:types.CodeType) -> bool:
+        if (a_code.co_flags, a_code.co_argcount, a_code.co_posonlyargcount, a_code.co_kwonlyargcount) != \
+                (b_code.co_flags, b_code.co_argcount, b_code.co_posonlyargcount, b_code.co_kwonlyargcount):
+            return False
+        if set(a_code.co_cellvars) != set(b_code.co_cellvars) or \
+                set(a_code.co_freevars) != set(b_code.co_freevars):
+            return False
+        # A name turned local or global changes every line using it
+        names = set(a_code.co_names) | set(b_code.co_names)
+        return not (set(a_code.co_varnames) ^ set(b_code.co_varnames)) & names
+
+    def get_scope_lines(self, a_code:str, b_code:str) -> set:
+        # Lines of functions whose local, cell or free variables changed, None if functions are added or removed
+        try:
+            a_code_objects = self.get_code_objects(compile(a_code, '<a>', 'exec'))
+            b_code_objects = self.get_code_objects(compile(b_code, '<b>', 'exec'))
+        except SyntaxError:
+            return None
+        if a_code_objects.keys() != b_code_objects.keys():
+            return None
+        lines = set()
+        for name, a_codes in a_code_objects.items():
+            b_codes = b_code_objects[name]
+            if len(a_codes) != len(b_codes):
+                return None
+            if not all(self.is_same_scope(a, b) for a, b in zip(a_codes, b_codes)):
+                lines.update(self.get_code_lines(a_codes))
+        return lines
+
+    def get_anchor(self, lines:list, lineno:int, is_anchor) -> int:
+        # Nearest previous line which runs whenever this line runs: its previous sibling or block header
+        indent = get_indentation(lines[lineno-1])
+        for prev in range(lineno-1, 0, -1):
+            stmt = lines[prev-1]
+            if not stmt.strip() or get_indentation(stmt) > indent:
+                continue
+            indent = get_indentation(stmt)
+            if stmt.strip().startswith(self.silent_clauses):
+                continue
+            if is_anchor(prev):
+                return prev
+        return None
+
+    def get_witness_lines(self, lines:list, lineno:int, body_lines:dict) -> set:
+        # Lines of the parent program, one of them is executed by any testcase reaching this line
+        stmt = lines[lineno-1].strip()
+        if not stmt.startswith(self.silent_clauses):
+            if stmt.startswith(('def ', 'async def ')):
+                return {lineno} | body_lines[lineno]
+            return {lineno}
+        anchor = self.get_anchor(lines, lineno, lambda prev: True)
+        if anchor is None:
+            return None
+        return self.get_witness_lines(lines, anchor, body_lines)
+
+    def get_line_map(self, a_code:str, b_code:str) -> dict:
+        # Lines of the parent program mapped to the same lines of the child program
+        a_lines, b_lines = get_stmt_list(a_code), get_stmt_list(b_code)
+        matcher = difflib.SequenceMatcher(None, a_lines, b_lines, autojunk=False)
+        line_map = {}
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                for k in range(i2 - i1):
+                    line_map[i1+k+1] = j1+k+1
+        return line_map
+
+    def get_modified_lines(self, a_code:str, b_code:str, line_map:dict) -> set:
+        # Parent lines reached by every testcase that runs a modified statement, None if the module changed
+        a_lines, b_lines = get_stmt_list(a_code), get_stmt_list(b_code)
+        a_body_lines = self.get_body_lines(ast.parse(a_code))
+        b_body_lines = self.get_body_lines(ast.parse(b_code))
+        a_in_body = set().union(*a_body_lines.values())
+        b_in_body = set().union(*b_body_lines.values())
+        b_line_map = {b_line:a_line for a_line, b_line in line_map.items()}
+
+        modified = set()
+        for a_line in range(1, len(a_lines)+1):
+            if a_line in line_map.keys() or not a_lines[a_line-1].strip():
+                continue
+            if a_line not in a_in_body:
+                return None
+            witness = self.get_witness_lines(a_lines, a_line, a_body_lines)
+            if witness is None:
+                return None
+            modified.update(witness)
+        for b_line in range(1, len(b_lines)+1):
+            if b_line in b_line_map.keys() or not b_lines[b_line-1].strip():
+                continue
+            if b_line not in b_in_body:
+                return None
+            anchor = self.get_anchor(b_lines, b_line, lambda prev: prev in b_line_map.keys())
+            if anchor is None:
+                return None
+            witness = self.get_witness_lines(a_lines, b_line_map[anchor], a_body_lines)
+            if witness is None:
+                return None
+            modified.update(witness)
+        return modified
+
+    def remap_traces(self, traces, line_map:dict):
+        if isinstance(traces, dict):
+            return {line_map[lineno]:hits for lineno, hits in traces.items()}
+        return [line_map[lineno] for lineno in traces]
+
+    def is_key_input(self, code:str) -> bool:
+        np = NodeParser()
+        np.run(tree=ast.parse(code))
+        return np.key_input
+
+    def run(self, a_code:str, a_test_hist:dict, a_trace_hist:dict, b_code:str) -> tuple:
+        # Testcases of the parent which may reach a statement modified in the child, None to run every testcase
+        # Traces of programs reading stdin start at their last line, they do not cover the program
+        if self.is_key_input(a_code) or self.is_key_input(b_code):
+            return None
+        line_map = self.get_line_map(a_code, b_code)
+        modified = self.get_modified_lines(a_code, b_code, line_map)
+        if modified is None:
+            return None
+        scope_lines = self.get_scope_lines(a_code, b_code)
+        if scope_lines is None:
+            return None
+        modified |= scope_lines
+
+        selected = []
+        for tc_no, status in a_test_hist.items():
+            traces = a_trace_hist[tc_no]
+            if status not in self.traced_statuses or not modified.isdisjoint(traces) or \
+                    any(lineno not in line_map.keys() for lineno in traces):
+                selected.append(tc_no)
+        return selected, line_map
@@ -0,0 +1,137 @@
+import ast
+import types
+
+from .tracer import Tracer
+from ..transform import NodeParser
+from ..utils import regularize, get_stmt_list
+
+
+class TestSession:
+    def __init__(self, code:str):
+        # Built once per (regularized) candidate program, testcases only add their input
+        self.code = code
+        self.tree = ast.parse(code)
+        np = NodeParser()
+        np.run(tree=self.tree)
+        self.var_names = np.var_name_list
+        self.key_input = np.key_input
+        self.program = self.compile(self.tree)
+        self.loc = len(get_stmt_list(code))
+        self.inputs = {}
+        # Programs only made of definitions run them once, testcases start from a copy of their namespace
+        self.definitions = self.is_definitions(self.tree)
+        self.snapshot = None
+
+    def compile(self, tree:ast.Module):
+        # Errors are raised when the testcase runs, like exec() of the test code
+        try:
+            return compile(tree, Tracer.filename, 'exec')
+        except SyntaxError as e:
+            return e
+
+    def is_definitions(self, tree:ast.Module) -> bool:
+        # Module level has no output, no mutable values and binds each name once
+        if self.key_input or isinstance(self.program, SyntaxError):
+            return False
+        names = []
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                names.extend((alias.asname or alias.name).split('.')[0] for alias in node.names)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if node.decorator_list or \
+                        any(isinstance(n, ast.Call) for n in ast.walk(node.args)) or \
+                        (node.returns is not None and any(isinstance(n, ast.Call) for n in ast.walk(node.returns))):
+                    return False
+                defaults = node.args.defaults + [d for d in node.args.kw_defaults if d is not None]
+                if not all(isinstance(d, ast.Constant) for d in defaults):
+                    return False
+                names.append(node.name)
+            elif isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and \
+                    all(isinstance(target, ast.Name) for target in node.targets):
+                names.extend(target.id for target in node.targets)
+            elif not (isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)):
+                return False
+        return '*' not in names and len(names) == len(set(names))
+
+    def get_snapshot(self) -> dict:
+        # Namespace after the definitions, None if the program runs again for each testcase
+        if self.snapshot is None and self.definitions:
+            snapshot = {'__name__':'__main__'}
+            try:
+                exec(self.program, snapshot)
+            except Exception:
+                self.definitions = False
+            else:
+                self.snapshot = snapshot
+        return self.snapshot
+
+    def restore(self, namespace:dict):
+        # Functions are bound to the copy, globals they change are not seen by the next testcase
+        for name, value in self.snapshot.items():
+            if name in namespace.keys():
+                continue
+            if isinstance(value, types.FunctionType) and value.__globals__ is self.snapshot:
+                function = types.FunctionType(value.__code__, namespace, value.__name__,
+                                              value.__defaults__, value.__closure__)
+                function.__kwdefaults__ = value.__kwdefaults__
+                value = function
+            namespace[name] = value
+
+    def get_test_input(self, input_tc:str) -> str:
+        # Statement running the testcase, None if the input is read from stdin
+        if self.key_input:
+            return None
+        try:
+            test_input = input_tc
+            if 'print(' not in input_tc:
+                test_input = 'print(' + input_tc + ')'
+            regularize(input_tc)
+            return regularize(test_input)
+        except:
+            return None
+
+    def get_input(self, input_tc:str) -> tuple:
+        if input_tc not in self.inputs.keys():
+            test_input = self.get_test_input(input_tc)
+            if test_input is None:
+                self.inputs[input_tc] = None, None, self.loc
+            else:
+                # The testcase continues the program, line numbers are the same as in one test code
+                tree = ast.parse(test_input)
+                ast.increment_lineno(tree, self.loc)
+                call = self.compile(tree)
+                self.inputs[input_tc] = test_input, call, self.loc + len(get_stmt_list(test_input))
+        return self.inputs[input_tc]
+
+    def get_test_code(self, input_tc:str) -> str:
+        test_input, _, _ = self.get_input(input_tc)
+        if test_input is None:
+            return self.code
+        return self.code + '\n' + test_input
+
+    def get_loc(self, input_tc:str) -> int:
+        # Last line of the test code, traces before it belong to the program setup
+        return self.get_input(input_tc)[2]
+
+    def get_code_objects(self, input_tc:str) -> list:
+        # Code objects of the program and the testcase, functions and classes included
+        codes = []
+        stack = [self.program, self.get_input(input_tc)[1]]
+        while stack:
+            code = stack.pop()
+            if isinstance(code, types.CodeType):
+                codes.append(code)
+                stack.extend(code.co_consts)
+        return codes
+
+    def execute(self, namespace:dict, input_tc:str):
+        call = self.get_input(input_tc)[1]
+        codes = self.program, call
+        if self.snapshot is not None:
+            self.restore(namespace)
+            codes = call,
+        for code in codes:
+            if isinstance(code, SyntaxError):
+                raise code
+            if code is not None:
+                exec(code, namespace)
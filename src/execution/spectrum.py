@@ -0,0 +1,34 @@
+import numpy as np
+from itertools import chain
+
+
+class Spectrum:
+    def __init__(self, test_hist:dict, trace_hist:dict, success:str='Success'):
+        # Coverage matrix (testcase x line) and failed vector of one program
+        tc_no_list = list(test_hist.keys())
+        traces = [trace_hist[tc_no] for tc_no in tc_no_list]
+        sizes = np.fromiter(map(len, traces), dtype=np.intp, count=len(traces))
+        linenos = np.fromiter(chain.from_iterable(traces), dtype=np.int64, count=int(sizes.sum()))
+
+        # Line numbers are small, columns are looked up without sorting every hit
+        present = np.bincount(linenos) > 0
+        self.lines = np.flatnonzero(present)
+        columns = np.cumsum(present) - 1
+        self.coverage = np.zeros((len(tc_no_list), len(self.lines)), dtype=bool)
+        self.coverage[np.repeat(np.arange(len(tc_no_list)), sizes), columns[linenos]] = True
+        self.failed = np.fromiter((status != success for status in test_hist.values()), dtype=bool, count=len(tc_no_list))
+
+        # Number of failed/passed testcases executing (ef, ep) or not executing (nf, np) each line
+        self.total_fail = int(self.failed.sum())
+        self.total_pass = len(tc_no_list) - self.total_fail
+        self.ef = self.coverage[self.failed].sum(axis=0)
+        self.ep = self.coverage[~self.failed].sum(axis=0)
+        self.nf = self.total_fail - self.ef
+        self.np = self.total_pass - self.ep
+
+    def divide(self, a, b, default:float=0) -> np.ndarray:
+        a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+        return np.divide(a, b, out=np.full(a.shape, default, dtype=float), where=b != 0)
+
+    def to_dict(self, scores:np.ndarray) -> dict:
+        return {lineno:round(score, 1) for lineno, score in zip(self.lines.tolist(), scores.tolist())}
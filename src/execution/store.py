@@ -0,0 +1,99 @@
+import os
+import zlib
+import time
+import pickle
+import hashlib
+import sqlite3
+
+
+class TraceStore:
+    # Max number of keys in one query
+    chunk_size = 500
+    # Format of stored results, results of other formats are not used
+    version = 2
+
+    def __init__(self, path:str='trace.sqlite3', size:int=512):
+        self.path = path
+        # Max size (MB) of the stored results, least recently used results are evicted
+        self.size = size * 1024 * 1024
+        self.pid = None
+        self.con = None
+        # Size of the stored results, read when connecting and kept up to date by put and evict
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+
+    def connect(self) -> sqlite3.Connection:
+        # Connections are not shared with forked processes
+        if self.pid != os.getpid():
+            self.con = sqlite3.connect(self.path, timeout=60)
+            self.con.execute('CREATE TABLE IF NOT EXISTS trace ('
+                             'key BLOB PRIMARY KEY, value BLOB NOT NULL, '
+                             'size INTEGER NOT NULL, used REAL NOT NULL);')
+            self.con.execute('CREATE INDEX IF NOT EXISTS trace_used ON trace (used);')
+            self.total = self.get_total()
+            self.pid = os.getpid()
+        return self.con
+
+    def get_total(self) -> int:
+        return self.con.execute('SELECT COALESCE(SUM(size), 0) FROM trace;').fetchone()[0]
+
+    def digest(self, *values) -> bytes:
+        return hashlib.blake2b(repr(values).encode(), digest_size=16).digest()
+
+    def get_key(self, program:bytes, testcase:dict, config:bytes) -> bytes:
+        # Testcase numbers do not change results
+        testcase = testcase['input_tc'], testcase['output_tc'], testcase.get('timeout')
+        return self.digest(self.version, program, testcase, config)
+
+    def get(self, keys:list) -> dict:
+        con = self.connect()
+        results = {}
+        keys = list(dict.fromkeys(keys))
+        for start in range(0, len(keys), self.chunk_size):
+            chunk = keys[start:start+self.chunk_size]
+            query = ', '.join(['?'] * len(chunk))
+            for key, value in con.execute(f'SELECT key, value FROM trace WHERE key IN ({query});', chunk):
+                results[key] = pickle.loads(zlib.decompress(value))
+            con.execute(f'UPDATE trace SET used=? WHERE key IN ({query});', [time.time(), *chunk])
+        con.commit()
+        self.hits += len(results)
+        self.misses += len(keys) - len(results)
+        return results
+
+    def put(self, results:dict):
+        con = self.connect()
+        rows = []
+        for key, result in results.items():
+            value = zlib.compress(pickle.dumps(result))
+            rows.append((key, value, len(value), time.time()))
+        con.executemany('INSERT OR REPLACE INTO trace VALUES (?, ?, ?, ?);', rows)
+        con.commit()
+        self.total += sum(size for _, _, size, _ in rows)
+        self.evict()
+
+    def evict(self):
+        if self.total <= self.size:
+            return
+        # Replaced rows and other processes make the running total inexact, it is read again before evicting
+        con = self.connect()
+        total = self.get_total()
+        if total <= self.size:
+            self.total = total
+            return
+        # Make room for a while, down to 90% of the max size
+        keys = []
+        for key, size in con.execute('SELECT key, size FROM trace ORDER BY used;'):
+            if total <= self.size * 0.9:
+                break
+            keys.append(key)
+            total -= size
+        con.executemany('DELETE FROM trace WHERE key=?;', [(key,) for key in keys])
+        con.commit()
+        self.total = total
+
+    def close(self):
+        if self.con is not None and self.pid == os.getpid():
+            self.con.close()
+        self.pid = None
+        self.con = None
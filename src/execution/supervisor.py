@@ -0,0 +1,109 @@
+import os
+import math
+import signal
+import resource
+import multiprocessing
+
+
+class Timeout(BaseException):
+    pass
+
+
+def raise_timeout(signum, frame):
+    raise Timeout()
+
+
+class Supervisor:
+    def __init__(self, timeout:float=1, memory:int=None, grace:float=1):
+        self.timeout = timeout
+        # Address space (MB) a child may allocate on top of its own
+        self.memory = memory
+        # Extra wall-clock seconds before a child that ignores its limits is killed
+        self.grace = grace
+
+    def get_timeout(self, job) -> float:
+        if isinstance(job, dict) and job.get('timeout'):
+            return job['timeout']
+        return self.timeout
+
+    def limit_memory(self):
+        if not self.memory: return
+        try:
+            with open('/proc/self/statm') as f:
+                used = int(f.read().split()[0]) * resource.getpagesize()
+        except OSError:
+            used = 0
+        limit = used + self.memory * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    def limit_time(self, timeout:float):
+        # Wall-clock and CPU time limits, both interrupt the candidate with Timeout
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = math.ceil(usage.ru_utime + usage.ru_stime + timeout)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+    def unlimit_time(self):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+    def __serve_child(self, jobs:list, execute, failed, writer):
+        # Child process, stdio are redirected so candidates never touch the terminal
+        try:
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in range(3):
+                os.dup2(devnull, fd)
+            signal.signal(signal.SIGALRM, raise_timeout)
+            signal.signal(signal.SIGXCPU, raise_timeout)
+            self.limit_memory()
+            for job in jobs:
+                self.limit_time(self.get_timeout(job))
+                try:
+                    result = execute(job)
+                except Timeout:
+                    result = failed('Timed Out')
+                finally:
+                    self.unlimit_time()
+                writer.send(result)
+        finally:
+            os._exit(0)
+
+    def __run_child(self, jobs:list, execute, failed) -> list:
+        results = []
+        reader, writer = multiprocessing.Pipe(duplex=False)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                reader.close()
+                self.__serve_child(jobs, execute, failed, writer)
+            finally:
+                os._exit(0)
+        writer.close()
+
+        for job in jobs:
+            if not reader.poll(self.get_timeout(job) + self.grace):
+                results.append(failed('Timed Out'))
+                break
+            try:
+                results.append(reader.recv())
+            except EOFError:
+                # Candidate killed its own process or exceeded a limit outside the candidate
+                results.append(failed('Error'))
+                break
+
+        reader.close()
+        try: os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError: pass
+        os.waitpid(pid, 0)
+        return results
+
+    def run(self, jobs:list, execute, failed) -> list:
+        # Fork a copy-on-write child per batch, and a new one after a killed job
+        results = []
+        while len(results) < len(jobs):
+            results.extend(self.__run_child(jobs[len(results):], execute, failed))
+        return results
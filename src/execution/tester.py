@@ -1,17 +1,42 @@
+import os
+import sys
 import warnings
 warnings.filterwarnings("ignore")
 
 from .results import Results
 from .testsuite import TestSuite
 from .unittests import Running, Tracing, RunUnitTest
+from .pool import TestPool
+from .sandbox import Sandbox, SandboxServer
+from .supervisor import Supervisor
+from .session import TestSession
+from .store import TraceStore
+from .tracer import Tracer, MonitoringTracer
 
-from ..utils import regularize, get_stmt_list
-from ..transform import NodeParser
+from ..utils import regularize
 
 class Tester:
-    def __init__(self, testcases:list, timeout:int=1):
+    # Statuses of runs that did not finish normally (timeouts, killed children), they depend on the machine load
+    unfinished = ('Timed Out', 'Error')
+
+    def __init__(self, testcases:list, timeout:int=1, workers:int=1, sandbox:bool=True, memory:int=None,
+                 store:TraceStore=None):
         self.testsuite = TestSuite(testcases)
         self.timeout = timeout
+        self.memory = memory
+        self.workers = workers
+        # Results of earlier runs, shared by runs with the same testcases and tracer config
+        self.store = store
+        # Candidates run in supervised child processes wherever fork is available
+        self.supervisor = Supervisor(timeout, memory) if hasattr(os, 'fork') else None
+        self.sandbox = sandbox and self.supervisor is not None
+        self.pool = TestPool(self, workers) if workers > 1 else None
+        self.server = SandboxServer(self) if self.sandbox and self.pool is None else None
+        # Pool and server are used by the process creating the tester only, forked processes run testcases themselves
+        self.pid = os.getpid()
+        # Backends are compared once here, before sandboxes are forked
+        if Tracer.backend == 'auto':
+            MonitoringTracer.is_available()
     
 
     def split_test_hist(self, test_hist:dict) -> list:
@@ -31,68 +56,122 @@ class Tester:
     def print_testcase(self, idx:int) -> str:
         return self.testsuite.print_testcase(idx)
 
-    def __gen_test_code(self, code:str, input_tc:str, key_input:bool=False) -> str:
-        try:
-            test_input = input_tc
-            if 'print(' not in input_tc:
-                test_input = 'print(' + input_tc + ')'
-            regularize(input_tc)
-            regularize(test_input)
-        except:
-            key_input = True
-
-        test_code = code.strip()
-        if not key_input:
-            if 'print(' not in input_tc:
-                input_tc = 'print(' + input_tc + ')'
-            test_code = code + '\n\n' + input_tc
-
-        return regularize(test_code)
-    
-    
-    def run(self, code:str, testcase:dict[str, str]={'input_tc':'', 'output_tc':''}, UnitTest=Running) -> tuple[str, str]:
-        Results.init_global_vars()
-        np = NodeParser()
-        np.run(code)
-        key_input = np.key_input
-        Results.vari_names = np.var_name_list
-        Results.timeout = self.timeout
+    def prepare(self, session:TestSession, testcase:dict[str, str]):
+        Results.vari_names = session.var_names
+        Results.timeout = self.supervisor.get_timeout(testcase) if self.supervisor else self.timeout
         Results.input_tc = testcase['input_tc']
         Results.output_tc = testcase['output_tc']
-        Results.test_code = self.__gen_test_code(code, testcase['input_tc'], key_input)
+        Results.loc = session.get_loc(testcase['input_tc'])
+
+    def run_session(self, session:TestSession, testcase:dict[str, str], UnitTest=Running) -> tuple[str, str]:
+        Results.init_global_vars()
+        self.prepare(session, testcase)
+        Results.test_code = session.get_test_code(testcase['input_tc'])
         rut = RunUnitTest()
         rut.run(UnitTest)
-
-        # Exclude trace before testcase run
-        loc = len(get_stmt_list(Results.test_code))
-        try:
-            start = Results.exec_traces.index(loc)
-            del Results.exec_traces[:start+1]
-        except: pass
         return Results.status, Results.output
 
+    def run(self, code:str, testcase:dict[str, str]={'input_tc':'', 'output_tc':''}, UnitTest=Running) -> tuple[str, str]:
+        return self.run_session(TestSession(regularize(code)), testcase, UnitTest)
+
+    def run_testcases(self, code:str, testcases:list, tracing:bool=False) -> list:
+        session = TestSession(code)
+        if self.sandbox:
+            return Sandbox(self).run(session, testcases, tracing)
+
+        UnitTest = Tracing if tracing else Running
+        def execute(testcase):
+            self.run_session(session, testcase, UnitTest)
+            return Results.status, Results.vari_traces, Results.exec_traces
+
+        if self.supervisor is None:
+            return [execute(testcase) for testcase in testcases]
+        failed = lambda status: (status, {}, Results.get_empty_traces())
+        return self.supervisor.run(testcases, execute, failed)
+
+    def run_programs(self, programs:dict, testcases:list, tracing:bool=False) -> dict:
+        # Run testcases of each program, in parallel if workers are available
+        if self.pool is not None and self.pid == os.getpid():
+            return self.pool.map(programs, testcases, tracing)
+        if self.server is not None and self.pid == os.getpid():
+            return self.server.map(programs, testcases, tracing)
+        return {key:self.run_testcases(code, testcases, tracing) for key, code in programs.items()}
+
+    def get_config(self, tracing:bool) -> bytes:
+        # Everything but the program and testcase that changes results
+        return self.store.digest(tracing, self.sandbox, self.timeout, self.memory,
+                                 Tracer.backend, Tracer.vari_digest, Tracer.digest_size, Tracer.vari_limit,
+                                 Results.raw_trace, sys.version_info[:2])
+
+    def get_testcases(self, tc_no_list:list=None) -> list:
+        if tc_no_list is None:
+            return list(self.testsuite)
+        return [self.testsuite.get_tc_by_no(tc_no) for tc_no in tc_no_list]
+
+    def execute(self, programs:dict, tracing:bool=False, tc_no_list:list=None) -> dict:
+        testcases = self.get_testcases(tc_no_list)
+        if self.store is None:
+            return self.run_programs(programs, testcases, tracing)
+
+        # Only (program, testcase) pairs missing in the store are run
+        config = self.get_config(tracing)
+        keys = {}
+        for key, code in programs.items():
+            program = self.store.digest(code)
+            keys[key] = [self.store.get_key(program, testcase, config) for testcase in testcases]
+        results = self.store.get([k for program_keys in keys.values() for k in program_keys])
+
+        groups = {}
+        for key, code in programs.items():
+            missing = tuple(i for i, k in enumerate(keys[key]) if k not in results.keys())
+            if missing:
+                groups.setdefault(missing, {})[key] = code
+        for missing, group in groups.items():
+            new_results = {}
+            for key, result in self.run_programs(group, [testcases[i] for i in missing], tracing).items():
+                for i, testcase_result in zip(missing, result):
+                    new_results[keys[key][i]] = testcase_result
+            # Unfinished runs are not stored, they are run again by later runs
+            self.store.put({k:result for k, result in new_results.items() if result[0] not in self.unfinished})
+            results.update(new_results)
+        return {key:[results[k] for k in keys[key]] for key in programs.keys()}
+
     def validation(self, code:str) -> dict[int, str]:
         test_hist = {}
 
         code = regularize(code)
-        for testcase in self.testsuite:
-            self.run(code, testcase)
-            testcase_no = testcase['testcase_no']
-            test_hist[testcase_no] = Results.status
+        results = self.execute({code:code})[code]
+        for testcase_no, (status, _, _) in zip(self.get_tc_no_list(), results):
+            test_hist[testcase_no] = status
         
         return test_hist
 
-    def trace(self, code:str) -> tuple[dict[int, str], dict[int, dict], dict[int, list]]:
-        test_hist = {}
-        vari_hist = {}
-        trace_hist = {}
+    def trace(self, code:str, tc_no_list:list=None) -> tuple[dict[int, str], dict[int, dict], dict[int, list]]:
+        return self.trace_all({code:code}, tc_no_list)[code]
 
-        code = regularize(code)
-        for testcase in self.testsuite:
-            self.run(code, testcase, Tracing)
-            testcase_no = testcase['testcase_no']
-            test_hist[testcase_no] = Results.status
-            vari_hist[testcase_no] = Results.vari_traces
-            trace_hist[testcase_no] = Results.exec_traces
+    def trace_all(self, programs:dict, tc_no_list:list=None) -> dict[str, tuple]:
+        hists = {}
+        if tc_no_list is None:
+            tc_no_list = self.get_tc_no_list()
+
+        programs = {key:regularize(code) for key, code in programs.items()}
+        results = self.execute(programs, tracing=True, tc_no_list=tc_no_list)
+        for key, result in results.items():
+            test_hist = {}
+            vari_hist = {}
+            trace_hist = {}
+            for testcase_no, (status, vari_traces, exec_traces) in zip(tc_no_list, result):
+                test_hist[testcase_no] = status
+                vari_hist[testcase_no] = vari_traces
+                trace_hist[testcase_no] = exec_traces
+            hists[key] = test_hist, vari_hist, trace_hist
         
-        return test_hist, vari_hist, trace_hist
\ No newline at end of file
+        return hists
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+        if self.server is not None:
+            self.server.close()
+        if self.store is not None:
+            self.store.close()
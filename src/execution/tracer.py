@@ -1,31 +1,75 @@
+import dis
 import sys
+import hashlib
 import trace
 import threading
 
 from .results import Results
 
 class Tracer(trace.Trace):
+    # Filename of candidate programs compiled by the sandbox
+    filename = '<candidate>'
+    # Tracer backend of the sandbox: 'auto', 'monitoring' or 'settrace'
+    backend = 'auto'
+    # Variable values are stored as (type name, digest) instead of (type name, str(value))
+    vari_digest = False
+    digest_size = 16
+    # Max number of values stored for each variable, None is unlimited
+    vari_limit = None
+    # Same object of these types always has the same value
+    immutable_types = (str, bytes, int, float, complex, bool, type(None))
+
     def __init__(self, count=1, trace=0, countfuncs=0, countcallers=0,
                         ignoremods=(), ignoredirs=[sys.prefix, sys.exec_prefix], infile=None, outfile=None,
                         timing=False):
         super().__init__(count, trace, countfuncs, countcallers,
                         ignoremods, ignoredirs, infile, outfile,
                         timing)
-        
+        # Last traced object of each variable
+        self.objects = {}
+
+    def get_value(self, v):
+        if not self.vari_digest:
+            return type(v).__name__, str(v)
+        # Tuples are hashed as lists, they are close types for variable mapping
+        value = str(list(v)) if type(v) is tuple else str(v)
+        digest = hashlib.blake2b(value.encode(errors='surrogatepass'), digest_size=self.digest_size).digest()
+        return type(v).__name__, digest
+
     def variable_trace(self, var_dict:dict):
         for k, v in var_dict.items():
             if k not in Results.vari_names:
                 continue
-            v = str(v)
             if k not in Results.vari_traces.keys():
                 Results.vari_traces[k] = []
+            if self.vari_limit is not None and \
+                    len(Results.vari_traces[k]) >= self.vari_limit:
+                continue
+            if type(v) in self.immutable_types and self.objects.get(k) is v:
+                continue
+            self.objects[k] = v
+            v = self.get_value(v)
             if len(Results.vari_traces[k]) == 0 or \
                     Results.vari_traces[k][-1] != v:
                 Results.vari_traces[k].append(v)
     
     def execution_trace(self, lineno:int):
-        Results.exec_traces.append(lineno)
+        # Exclude trace before testcase run, up to the first hit of its last line
+        if lineno == Results.loc:
+            Results.loc = None
+            Results.exec_traces.clear()
+        elif Results.raw_trace:
+            Results.exec_traces.append(lineno)
+        else:
+            # Lines in order of first hit with their hit counts
+            Results.exec_traces[lineno] = Results.exec_traces.get(lineno, 0) + 1
     
+    def globaltrace_lt(self, frame, why, arg):
+        # Trace candidate code only, it is compiled by the sandbox or exec() of unittests
+        if why == 'call' and frame.f_code.co_filename in (self.filename, '<string>'):
+            return self.localtrace
+        return None
+
     def localtrace_count(self, frame, why, arg):
         if why == "line":
             filename = frame.f_code.co_filename
@@ -46,8 +90,142 @@ class Tracer(trace.Trace):
             threading.settrace(self.globaltrace)
             sys.settrace(self.globaltrace)
         try:
-            exec(cmd)
+            exec(cmd, globals, locals)
         finally:
             if not self.donothing:
                 sys.settrace(None)
-                threading.settrace(None)
\ No newline at end of file
+                threading.settrace(None)
+
+
+class MonitoringTracer(Tracer):
+    # sys.monitoring (PEP 669) backend, only the candidate's code objects raise events
+    tool_id = 1 # sys.monitoring.COVERAGE_ID
+    tool_name = 'apr-tracer'
+    # Probe traced by both backends before 'auto' uses monitoring, lambdas start on their RESUME line
+    probe = '''SQ = lambda v: v * v
+
+def helper(x):
+    return SQ(x)
+
+def probe(xs):
+    xs = list(xs)
+    xs.sort(key=lambda v: -v)
+    total = sum(x for x in xs)
+    return helper(xs[0]) + helper(total)
+'''
+    equivalent = None
+
+    def __init__(self, code_objects:list=()):
+        super().__init__()
+        self.code_objects = code_objects
+        self.lines = {}
+        self.started = None
+
+    @classmethod
+    def trace_probe(cls, tracer_class) -> tuple:
+        code = compile(cls.probe, Tracer.filename, 'exec')
+        code_objects, stack = [], [code]
+        while stack:
+            code_object = stack.pop()
+            if isinstance(code_object, type(code)):
+                code_objects.append(code_object)
+                stack.extend(code_object.co_consts)
+        namespace = {}
+        exec(code, namespace)
+        state = Results.exec_traces, Results.vari_traces, Results.vari_names, Results.loc
+        Results.exec_traces = Results.get_empty_traces()
+        Results.vari_traces, Results.vari_names, Results.loc = {}, ['xs', 'v', 'x', 'total'], None
+        try:
+            tracer = cls(code_objects) if tracer_class is cls else tracer_class()
+            tracer.runfunc(namespace['probe'], [1, 3, 2])
+            return Results.exec_traces, Results.vari_traces
+        finally:
+            Results.exec_traces, Results.vari_traces, Results.vari_names, Results.loc = state
+
+    @classmethod
+    def is_available(cls) -> bool:
+        # 'auto' falls back to settrace if both backends do not trace the probe the same
+        if not hasattr(sys, 'monitoring'):
+            return False
+        if Tracer.backend != 'auto':
+            return True
+        if cls.equivalent is None:
+            cls.equivalent = cls.trace_probe(cls) == cls.trace_probe(Tracer)
+        return cls.equivalent
+
+    def get_line(self, code, offset:int) -> int:
+        if code not in self.lines.keys():
+            self.lines[code] = {}
+            for start, end, lineno in code.co_lines():
+                for i in range(start, end, 2):
+                    self.lines[code][i] = lineno
+        return self.lines[code].get(offset)
+
+    def get_start_line(self, code) -> int:
+        # Line of RESUME if the first instruction after it is on the same line (lambdas, closures, generators)
+        resume = next(i for i in range(0, len(code.co_code), 2) if code.co_code[i] == dis.opmap['RESUME'])
+        lineno = self.get_line(code, resume + 2)
+        return lineno if lineno is not None and lineno == self.get_line(code, resume) else None
+
+    def start(self, code, offset:int):
+        # Some versions skip the LINE event of this line, settrace never does
+        lineno = self.get_start_line(code)
+        if lineno is None:
+            return sys.monitoring.DISABLE
+        frame = sys._getframe(1)
+        self.execution_trace(lineno)
+        self.variable_trace(frame.f_locals)
+        self.started = frame, lineno
+
+    def line(self, code, lineno:int):
+        # The LINE event of a line recorded when the frame started is not counted twice
+        frame = sys._getframe(1)
+        started, self.started = self.started, None
+        if started is not None and started[0] is frame and started[1] == lineno:
+            return
+        self.execution_trace(lineno)
+        self.variable_trace(frame.f_locals)
+
+    def jump(self, code, offset:int, destination:int):
+        self.started = None
+        # Same as settrace, a backward jump within one line (e.g. comprehensions) is a new line event
+        lineno = self.get_line(code, destination)
+        if destination > offset or lineno != self.get_line(code, offset):
+            return sys.monitoring.DISABLE
+        self.execution_trace(lineno)
+        self.variable_trace(sys._getframe(1).f_locals)
+
+    def leave(self, code, offset:int, arg):
+        self.started = None
+        # Values assigned on the last line are only seen when the frame is left
+        self.variable_trace(sys._getframe(1).f_locals)
+
+    def runfunc(self, func, /, *args, **kw):
+        monitoring = sys.monitoring
+        events = monitoring.events
+        try:
+            monitoring.use_tool_id(self.tool_id, self.tool_name)
+        except ValueError:
+            # Tool id is taken by a debugger or coverage tool
+            return Tracer().runfunc(func, *args, **kw)
+        callbacks = {events.LINE:self.line, events.JUMP:self.jump,
+                     events.PY_START:self.start, events.PY_RETURN:self.leave, events.PY_YIELD:self.leave}
+        local_events = events.LINE | events.JUMP | events.PY_START | events.PY_RETURN | events.PY_YIELD
+        try:
+            for event, callback in callbacks.items():
+                monitoring.register_callback(self.tool_id, event, callback)
+            for code in self.code_objects:
+                monitoring.set_local_events(self.tool_id, code, local_events)
+            return func(*args, **kw)
+        finally:
+            for code in self.code_objects:
+                monitoring.set_local_events(self.tool_id, code, events.NO_EVENTS)
+            for event in callbacks.keys():
+                monitoring.register_callback(self.tool_id, event, None)
+            monitoring.free_tool_id(self.tool_id)
+
+
+def get_tracer(code_objects:list=()) -> Tracer:
+    if Tracer.backend == 'settrace' or not MonitoringTracer.is_available():
+        return Tracer()
+    return MonitoringTracer(code_objects)
@@ -1,12 +1,10 @@
 import unittest
 from io import StringIO
 from unittest.mock import patch, mock_open
-# from timeout_function_decorator import timeout
-from timeout_decorator import timeout
 
 from .results import Results
-from .manager import Manager
 from .tracer import Tracer
+from .supervisor import Timeout
 
 class TextTestResult(unittest.TextTestResult):
     def __init__(self, stream, descriptions, verbosity):
@@ -36,15 +34,15 @@ class Running(unittest.TestCase):
         except AssertionError as e:
             raise AssertionError(actual)
 
-    @timeout(Results.timeout)
     @patch('sys.stderr', new_callable=StringIO)
     @patch('sys.stdout', new_callable=StringIO)
-    @Manager
     def test(self, mock_stdout, mock_stderr):
         with patch('sys.stdin', self.input_data):
             with patch('builtins.open', mock_open(read_data=Results.input_tc)):
                 with patch('builtins.input', side_effect=self.input_data):
-                    try: exec(Results.test_code)
+                    # Fresh module namespace, candidates never see the runner or earlier candidates
+                    try: exec(Results.test_code, {'__name__':'__main__'})
+                    except Timeout: Results.status = 'Timed Out'
                     except: pass
         output = mock_stdout.getvalue().strip()
         self.assertEqual(output, Results.output_tc)
@@ -60,15 +58,15 @@ class Tracing(unittest.TestCase):
         except AssertionError as e:
             raise AssertionError(actual)
 
-    @timeout(Results.timeout)
     @patch('sys.stderr', new_callable=StringIO)
     @patch('sys.stdout', new_callable=StringIO)
-    @Manager
     def test(self, mock_stdout, mock_stderr):
         with patch('sys.stdin', self.input_data):
             with patch('builtins.open', mock_open(read_data=Results.input_tc)):
                 with patch('builtins.input', side_effect=self.input_data):
-                    try: Tracer().runctx(Results.test_code, globals())
+                    namespace = {'__name__':'__main__'}
+                    try: Tracer().runctx(Results.test_code, namespace, namespace)
+                    except Timeout: Results.status = 'Timed Out'
                     except: pass
         output = mock_stdout.getvalue().strip()
         self.assertEqual(output, Results.output_tc)
@@ -86,7 +84,8 @@ class RunUnitTest:
             runner = unittest.TextTestRunner(stream=StringIO())
             runner.resultclass = TextTestResult
             res = runner.run(suite)
-            Results.status = res.status
+            # A candidate interrupted by the supervisor stays timed out, whatever it printed before
+            Results.status = res.status if Results.status is None else Results.status
             Results.output = res.output
         except Exception as e:
             Results.status = 'Error'
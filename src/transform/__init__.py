@@ -1,6 +1,8 @@
-from .fixer import Fixer
+from .editScript import EditScript
 from .nodeParser import NodeParser
 from .swtVariables import SWTVariables
 from .defUseChain import DefUseChain
 from .variableMap import VariableMap
-from .nodeMap import NodeMap
\ No newline at end of file
+from .nodeMap import NodeMap
+from .alignment import Alignment
+from .programArtifact import ProgramArtifact
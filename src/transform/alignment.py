@@ -0,0 +1,46 @@
+class Alignment:
+    # Node type names interned to small ints, shared by every alignment
+    symbols = {}
+
+    @classmethod
+    def intern(cls, names:list) -> list:
+        return [cls.symbols.setdefault(name, len(cls.symbols)) for name in names]
+
+    @classmethod
+    def get_columns(cls, a:list, b:list) -> list:
+        # Bit-parallel LCS (Hyyro), bit i of column j is 0 where dp[i+1][j] > dp[i][j]
+        masks = {}
+        for i, symbol in enumerate(a):
+            masks[symbol] = masks.get(symbol, 0) | (1 << i)
+        full = (1 << len(a)) - 1
+        v = full
+        columns = [v]
+        for symbol in b:
+            u = v & masks.get(symbol, 0)
+            v = ((v + u) | (v - u)) & full
+            columns.append(v)
+        return columns
+
+    @classmethod
+    def lcs_length(cls, a:list, b:list) -> int:
+        if not a or not b:
+            return 0
+        return len(a) - cls.get_columns(a, b)[-1].bit_count()
+
+    @classmethod
+    def lcs_pairs(cls, a:list, b:list) -> list:
+        # Matched (i, j) indexes from the end, ties are broken like the dp table backtracking
+        columns = cls.get_columns(a, b)
+        dp = lambda i, j: i - (columns[j] & ((1 << i) - 1)).bit_count()
+        pairs = []
+        i, j = len(a), len(b)
+        while i > 0 and j > 0:
+            if a[i - 1] == b[j - 1]:
+                pairs.append((i - 1, j - 1))
+                i -= 1
+                j -= 1
+            elif dp(i - 1, j) > dp(i, j - 1):
+                i -= 1
+            else:
+                j -= 1
+        return pairs
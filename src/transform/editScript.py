@@ -0,0 +1,234 @@
+import ast
+import copy
+
+
+class LineLayout:
+    # Line numbers of ast.parse(ast.unparse(tree)), without writing and parsing the code
+    # unparse starts every statement and clause on a new line, and a blank line before definitions
+    definitions = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    block_fields = ('body', 'orelse', 'finalbody')
+
+    class Fallback(Exception):
+        pass
+
+    def __init__(self):
+        self.line = 0
+
+    def fill(self) -> int:
+        self.line += 1
+        return self.line
+
+    def set_line(self, node, line:int):
+        # Every node of a header or simple statement is on its first line
+        for child in ast.walk(node):
+            if isinstance(child, ast.JoinedStr) and \
+                    any(isinstance(c, ast.Constant) and '\n' in str(c.value) for c in ast.walk(child)):
+                # f-strings with line breaks may be written on several lines
+                raise self.Fallback()
+            if 'lineno' in child._attributes:
+                child.lineno = child.end_lineno = line
+                if not hasattr(child, 'col_offset'):
+                    child.col_offset = child.end_col_offset = 0
+
+    def set_header(self, node, line:int, skip:tuple=()):
+        node.lineno = line
+        if not hasattr(node, 'col_offset'):
+            node.col_offset = node.end_col_offset = 0
+        for field, value in ast.iter_fields(node):
+            if field in self.block_fields or field in skip:
+                continue
+            for child in value if isinstance(value, list) else [value]:
+                if isinstance(child, ast.AST):
+                    self.set_line(child, line)
+
+    def strip(self, node):
+        # Blocks a statement got from another kind of statement are not written by unparse
+        for field in self.block_fields:
+            if field not in node._fields and field in node.__dict__:
+                delattr(node, field)
+
+    def visit_block(self, body:list, docstring:bool=False):
+        if not body:
+            # Empty blocks are not valid code, parsing them fails
+            raise self.Fallback()
+        first = body[0]
+        if docstring and isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and \
+                isinstance(first.value.value, str):
+            # Docstrings are triple quoted with their line breaks, unless both quotes are in them
+            value = first.value.value
+            lines = 0 if '"""' in value and "'''" in value else value.count('\n')
+            self.visit(first)
+            self.line += lines
+            first.end_lineno = first.value.end_lineno = self.line
+            body = body[1:]
+        for stmt in body:
+            self.visit(stmt)
+
+    def visit(self, node):
+        self.strip(node)
+        if isinstance(node, self.definitions):
+            if self.line:
+                self.line += 1
+            for decorator in node.decorator_list:
+                self.set_line(decorator, self.fill())
+            self.set_header(node, self.fill(), skip=('decorator_list',))
+            self.visit_block(node.body, docstring=True)
+        elif isinstance(node, ast.If):
+            self.set_header(node, self.fill())
+            self.visit_block(node.body)
+            chain = [node]
+            while node.orelse and len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
+                node = node.orelse[0]
+                self.strip(node)
+                chain.append(node)
+                self.set_header(node, self.fill())
+                self.visit_block(node.body)
+            if node.orelse:
+                self.fill()
+                self.visit_block(node.orelse)
+            for node in chain:
+                node.end_lineno = self.line
+            return
+        elif isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+            self.set_header(node, self.fill())
+            self.visit_block(node.body)
+            if node.orelse:
+                self.fill()
+                self.visit_block(node.orelse)
+        elif isinstance(node, (ast.Try, getattr(ast, 'TryStar', ast.Try))):
+            if not node.handlers and (node.orelse or not node.finalbody or not isinstance(node, ast.Try)):
+                raise self.Fallback()
+            self.set_header(node, self.fill(), skip=('handlers',))
+            self.visit_block(node.body)
+            for handler in node.handlers:
+                self.set_header(handler, self.fill())
+                self.visit_block(handler.body)
+                handler.end_lineno = self.line
+            if node.orelse:
+                self.fill()
+                self.visit_block(node.orelse)
+            if node.finalbody:
+                self.fill()
+                self.visit_block(node.finalbody)
+        elif isinstance(node, (ast.With, ast.AsyncWith)):
+            self.set_header(node, self.fill())
+            self.visit_block(node.body)
+        elif isinstance(node, ast.Match):
+            if not node.cases:
+                raise self.Fallback()
+            self.set_header(node, self.fill(), skip=('cases',))
+            for case in node.cases:
+                line = self.fill()
+                self.set_line(case.pattern, line)
+                if case.guard is not None:
+                    self.set_line(case.guard, line)
+                self.visit_block(case.body)
+        else:
+            self.set_line(node, self.fill())
+            return
+        node.end_lineno = self.line
+
+    def run(self, tree:ast.Module) -> ast.Module:
+        try:
+            if tree.body:
+                self.visit_block(tree.body, docstring=True)
+            return tree
+        except self.Fallback:
+            return ast.parse(ast.unparse(tree))
+
+
+class EditScript(ast.NodeTransformer):
+    # Applies the del/ins/rep/cut edits of a node map in one walk of the tree
+    # Statements are found through the block holding them, donor subtrees are copied once
+    block_fields = ('body', 'orelse', 'finalbody')
+
+    def __init__(self, node_map:dict):
+        self.node_map = dict(node_map)
+        self.slots = {}
+
+    def get_blocks(self, node) -> list:
+        # Blocks of a node, those it only got from a replaced statement included
+        return [(field, getattr(node, field)) for field in self.block_fields if hasattr(node, field)]
+
+    def update_slots(self, node):
+        for field, block in self.get_blocks(node):
+            for child in block:
+                self.slots[child] = node, field
+
+    def get_slot(self, node) -> tuple:
+        parent, field = self.slots[node]
+        block = getattr(parent, field)
+        return block, block.index(node)
+
+    def copy_patch(self, patch, fields:list):
+        # Donor blocks which are replaced right after are not copied
+        patch = copy.copy(patch)
+        for field in fields:
+            setattr(patch, field, [])
+        return copy.deepcopy(patch)
+
+    def detach(self, node):
+        # Statements moved out of a deleted one are not edited anymore
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self.node_map.pop(node, None)
+            stack.extend(ast.iter_child_nodes(node))
+            for field, block in self.get_blocks(node):
+                if field not in node._fields:
+                    stack.extend(block)
+
+    def del_node(self, node):
+        block, idx = self.get_slot(node)
+        del block[idx]
+        # Statements of the deleted node take its place
+        children = [child for _, child_block in self.get_blocks(node) for child in child_block]
+        for child in children:
+            self.detach(child)
+        block[idx:idx] = children
+        node = block[idx] if idx < len(block) else ast.Pass()
+        return self.fix_node(node)
+
+    def ins_node(self, node, patch):
+        # The patch is inserted before the node, with an empty body
+        patch = self.copy_patch(patch, [field for field, _ in self.get_blocks(patch)])
+        if hasattr(patch, 'body'):
+            patch.body = [ast.Pass()]
+        block, idx = self.get_slot(node)
+        block.insert(idx, patch)
+        return patch
+
+    def rep_node(self, node, patch):
+        # The patch keeps the blocks of the replaced node
+        blocks = self.get_blocks(node)
+        patch = self.copy_patch(patch, [field for field, _ in blocks])
+        for field, block in blocks:
+            setattr(patch, field, block)
+        return patch
+
+    def fix_node(self, node):
+        if node in self.node_map.keys():
+            action, patch = self.node_map.pop(node)
+            if action == 'del':
+                node = self.del_node(node)
+            elif action == 'ins':
+                node = self.ins_node(node, patch)
+            elif action == 'rep':
+                node = self.rep_node(node, patch)
+            elif action == 'cut':
+                node = copy.deepcopy(patch)
+            self.update_slots(node)
+        return node
+
+    def visit(self, node):
+        if isinstance(node, (ast.Module, ast.stmt)):
+            self.update_slots(node)
+        node = self.fix_node(node)
+        return self.generic_visit(node)
+
+    def run(self, tree:ast.Module) -> ast.Module:
+        return self.visit(tree)
+
+    @classmethod
+    def renumber(cls, tree:ast.Module) -> ast.Module:
+        return LineLayout().run(tree)
@@ -1,6 +1,8 @@
 import ast
 
 from .nodeParser import NodeParser
+from .alignment import Alignment
+from .programArtifact import ProgramArtifact
 
 class NodeMap:
 
@@ -29,31 +31,12 @@ class NodeMap:
         b_nodes = list(b_trace_node_map.keys())
         b_node_names = list(b_trace_node_map.values())
         
-        # Initialize a 2D array to store the lengths of LCS
-        dp = [[0] * (len(b_node_names) + 1) for _ in range(len(a_node_names) + 1)]
-
-        # Calculate the dp array
-        for i in range(1, len(a_node_names) + 1):
-            for j in range(1, len(b_node_names) + 1):
-                if a_node_names[i - 1] == b_node_names[j - 1]:
-                    dp[i][j] = dp[i - 1][j - 1] + 1
-                else:
-                    dp[i][j] = max(dp[i - 1][j], dp[i][j - 1])
-
         # Node mapping with LCS
         # Crossover: rep Node Mapping
-        i, j = len(a_node_names), len(b_node_names)
-        while i > 0 and j > 0:
-            if a_node_names[i - 1] == b_node_names[j - 1]:
-                a_node = a_nodes[i - 1]
-                b_node = b_nodes[j - 1]
-                rep_node_map[a_node] = ('rep', b_node)
-                i -= 1
-                j -= 1
-            elif dp[i - 1][j] > dp[i][j - 1]:
-                i -= 1
-            else:
-                j -= 1
+        a_symbols = Alignment.intern(a_node_names)
+        b_symbols = Alignment.intern(b_node_names)
+        for i, j in Alignment.lcs_pairs(a_symbols, b_symbols):
+            rep_node_map[a_nodes[i]] = ('rep', b_nodes[j])
     
         return rep_node_map
     
@@ -62,30 +45,30 @@ class NodeMap:
         ins_node_map = {}
         a_node_list = list(a_trace_node_map.keys())
         b_node_list = list(b_trace_node_map.keys())
+        ### Reverse indexes of the mapping (b_node -> a_node, a_node -> position)
+        a_node_idx = {a_node:idx for idx, a_node in enumerate(a_node_list)}
+        mapped_a_nodes = {}
+        for a_node, (act, b_node) in node_map.items():
+            if act == 'rep': mapped_a_nodes.setdefault(b_node, a_node)
         for b, b_node in enumerate(b_node_list):
             ### Skip if it already mapped
-            if ('rep', b_node) in node_map.values() or b == 0: continue
-            for i in range(b, 0, -1):
-                before_b_node = b_node_list[b-1]
-                ### Find before_b_node's mapped a_node
-                a_node = cls.find_ins_loc(a_node_list, before_b_node, node_map)
-                if a_node is not None:
-                    ### Inserts b_node before a_node 
-                    ### in the next sequence of mapped before_a_node
-                    if a_node not in ins_node_map.keys():
-                        ins_node_map[a_node] = ('ins', b_node)
-                    break
+            if b_node in mapped_a_nodes.keys() or b == 0: continue
+            before_b_node = b_node_list[b-1]
+            ### Find before_b_node's mapped a_node
+            a_node = cls.find_ins_loc(a_node_list, a_node_idx, mapped_a_nodes, before_b_node)
+            if a_node is not None:
+                ### Inserts b_node before a_node 
+                ### in the next sequence of mapped before_a_node
+                if a_node not in ins_node_map.keys():
+                    ins_node_map[a_node] = ('ins', b_node)
         return ins_node_map
     
     @classmethod
-    def find_ins_loc(cls, a_node_list, before_b_node, node_map):
-        for mapped_a_node, (_, mapped_b_node) in node_map.items():
-            if before_b_node == mapped_b_node:
-                before_a_node = mapped_a_node
-                a_idx = a_node_list.index(before_a_node)
-                if len(a_node_list) <= a_idx+1: break
-                return a_node_list[a_idx+1]
-        return None
+    def find_ins_loc(cls, a_node_list, a_node_idx, mapped_a_nodes, before_b_node):
+        if before_b_node not in mapped_a_nodes.keys(): return None
+        a_idx = a_node_idx[mapped_a_nodes[before_b_node]]
+        if len(a_node_list) <= a_idx+1: return None
+        return a_node_list[a_idx+1]
     
     @classmethod
     def del_node_map(cls, a_trace_node_map:dict, node_map:dict) -> dict:
@@ -108,12 +91,9 @@ class NodeMap:
 
 
     @classmethod
-    def trace(cls, a_code:str, a_traces:list, b_code:str,  b_traces:list) -> dict:
-        a_trace_node_map = cls.get_trace_node_map(ast.parse(a_code), a_traces)
-        b_trace_node_map = cls.get_trace_node_map(ast.parse(b_code), b_traces)
-
-        trace_map = cls.rep_node_map(a_trace_node_map, b_trace_node_map)
-        return trace_map
+    def trace_length(cls, a_artifact:ProgramArtifact, a_traces:list, b_artifact:ProgramArtifact, b_traces:list) -> int:
+        # Number of nodes rep_node_map maps for the traces, without building the mapping
+        return Alignment.lcs_length(a_artifact.get_trace_symbols(a_traces), b_artifact.get_trace_symbols(b_traces))
 
     @classmethod
     def crossover(cls, a_tree:ast, a_traces:list, b_tree:ast,  b_traces:list) -> dict:
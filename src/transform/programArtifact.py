@@ -0,0 +1,44 @@
+import ast
+from functools import cached_property
+
+from .nodeParser import NodeParser
+from .alignment import Alignment
+
+
+class ProgramArtifact:
+    # Parsed views of one program, computed on first use
+    # The tree is shared, transforms work on their own parse of the code
+    def __init__(self, code:str):
+        self.code = code
+        self.trace_symbols = {}
+
+    @cached_property
+    def tree(self) -> ast.Module:
+        return ast.parse(self.code)
+
+    @cached_property
+    def parser(self) -> NodeParser:
+        np = NodeParser()
+        np.run(tree=self.tree)
+        return np
+
+    @property
+    def line_node_map(self) -> dict:
+        return self.parser.line_node_map
+
+    @property
+    def var_names(self):
+        return self.parser.var_name_list
+
+    def get_trace_nodes(self, traces:list) -> list:
+        # Statements executed in the traces, in order of first hit
+        line_node_map = self.line_node_map
+        return list(dict.fromkeys(line_node_map[lineno] for lineno in traces if lineno in line_node_map.keys()))
+
+    def get_trace_symbols(self, traces:list) -> tuple:
+        # Interned node types of the executed statements
+        key = tuple(traces)
+        if key not in self.trace_symbols.keys():
+            names = [node.__class__.__name__ for node in self.get_trace_nodes(traces)]
+            self.trace_symbols[key] = tuple(Alignment.intern(names))
+        return self.trace_symbols[key]
@@ -2,7 +2,7 @@ import pylcs
 import ast
 from ordered_set import OrderedSet
 
-from .nodeParser import NodeParser
+from .programArtifact import ProgramArtifact
 
 from ..utils import Randoms
 
@@ -28,55 +28,29 @@ class VariableMap:
         for tc_id in self.tc_id_list:
             for var in self.b_var_hist[tc_id].keys():
                 b_var_set.add(var)
+        # Equivalent variables have the same signature, the first a_var is mapped
+        a_var_index = {}
+        for a_var in a_var_set:
+            a_var_index.setdefault(self.get_signature(self.a_var_hist, a_var), a_var)
         for b_var in b_var_set:
-            for a_var in a_var_set:
-                is_matched = True
-                for tc_id in self.tc_id_list:
-                    b_in = b_var in self.b_var_hist[tc_id].keys()
-                    a_in = a_var in self.a_var_hist[tc_id].keys()
-                    if not b_in and not a_in:
-                        continue
-                    elif b_in and not a_in:
-                        is_matched = False
-                        break
-                    elif not b_in and a_in:
-                        is_matched = False
-                        break
-                    else:
-                        b_var_values = self.b_var_hist[tc_id][b_var]
-                        a_var_values = self.a_var_hist[tc_id][a_var]
-                        if not self.__is_hist_equal(b_var_values, a_var_values):
-                            is_matched = False
-                            break
-                if is_matched:
-                    if b_var not in self.var_map.keys():
-                        self.var_map[b_var] = a_var
+            signature = self.get_signature(self.b_var_hist, b_var)
+            if signature in a_var_index.keys() and b_var not in self.var_map.keys():
+                self.var_map[b_var] = a_var_index[signature]
         return self.var_map
-    
-    def __is_hist_equal(self, hist_a, hist_b):
-        if len(hist_a) != len(hist_b):
-            return False
-        for i in range(len(hist_a)):
-            if not self.__is_equal(hist_a[i], hist_b[i]):
-                return False
-        return True
-
-    def __is_equal(self, object_a, object_b):
-        if str(type(object_a)) == str(type(object_b)):
-            if object_a == object_b:
-                return True
-            else:
-                return False
-        else:
-            close_type_list = ["<class 'list'>", "<class 'tuple'>"]
-            if str(type(object_a)) in close_type_list and \
-                    str(type(object_b)) in close_type_list:
-                if list(object_a) == list(object_b):
-                    return True
-                else:
-                    return False
-            else:
-                return False
+
+    def get_signature(self, var_hist:dict, var:str) -> tuple:
+        # Values of the variable in each testcase, None if it is not traced in the testcase
+        return tuple(tuple(map(self.get_value_key, var_hist[tc_id][var])) if var in var_hist[tc_id].keys() else None
+                     for tc_id in self.tc_id_list)
+
+    def get_value_key(self, value):
+        # Traced values, (type name, str(value) or digest)
+        type_name, value = value
+        if isinstance(value, str):
+            return value
+        # Digests of list and tuple values are equal
+        close_type_list = ['list', 'tuple']
+        return ('list' if type_name in close_type_list else type_name), value
             
 
     def lcs_var_map(self) -> dict:
@@ -116,15 +90,12 @@ class VariableMap:
         return self.var_map
     
     def get_var_type_dict(self, vari_hist:dict) -> dict:
+        # Type of the last value traced in the first testcase using the variable
         var_type_dict = {}
         for var_dict in vari_hist.values():
             for var, values in var_dict.items():
-                if var in var_type_dict.keys(): continue
-                for v in values:
-                    try: v = eval(v)
-                    except: pass
-                    var_type = type(v).__name__
-                    var_type_dict[var] = var_type
+                if var in var_type_dict.keys() or not values: continue
+                var_type_dict[var] = values[-1][0]
         return var_type_dict
     
     def get_same_type_var(self, var_name:str, var_type_dict:dict):
@@ -152,13 +123,9 @@ class VariableMap:
             if b_var not in self.var_map.keys():
                 self.var_map[b_var] = b_var
 
-    def run(self, a_tree, a_var_hist:dict, b_tree, b_var_hist:dict) -> dict:
-        np_a = NodeParser()
-        np_a.run(a_tree)
-        self.a_var_name_list = np_a.var_name_list
-        np_b = NodeParser()
-        np_b.run(b_tree)
-        self.b_var_name_list = np_b.var_name_list
+    def run(self, a_artifact:ProgramArtifact, a_var_hist:dict, b_artifact:ProgramArtifact, b_var_hist:dict) -> dict:
+        self.a_var_name_list = a_artifact.var_names
+        self.b_var_name_list = b_artifact.var_names
 
         self.a_var_hist = a_var_hist
         self.b_var_hist = b_var_hist
@@ -1,31 +1,45 @@
 import ast
-import re
 import pylcs
 from ordered_set import OrderedSet
 from zss import Node, simple_distance
 
 from .randoms import Randoms
 from .ted import TED
-
-def remove_comments_and_docstrings(code):
-    # Remove single-line comments and strings that are used as comments
-    code = re.sub(r'(?m)^\s*(#.*|\'[^\']*\'|"[^"]*")\s*$', '', code)
-    # Remove multi-line comments and docstrings
-    code = re.sub(r'(?s)(\'\'\'.*?\'\'\')|(""".*?""")', '', code)
-    return code
-
-def regular(code):
-    return ast.unparse(ast.parse(code))
+from .lruCache import LRUCache
+from .minHash import MinHashLSH
+
+def remove_comments_and_docstrings(tree:ast.AST) -> ast.AST:
+    # Comments are not parsed, remove docstrings and strings that are used as comments
+    for node in ast.walk(tree):
+        for field in ('body', 'orelse', 'finalbody'):
+            block = getattr(node, field, None)
+            if not isinstance(block, list) or not block: continue
+            block[:] = [stmt for stmt in block
+                        if not (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant)
+                                and isinstance(stmt.value.value, str))]
+            if not block and not isinstance(node, ast.Module):
+                block.append(ast.Pass())
+    return tree
+
+# Regularized code of recent programs, also keyed by itself
+regularized = LRUCache(maxsize=4096)
 
 def regularize(code):
-    code = regular(code)
-    code = remove_comments_and_docstrings(code)
-    return regular(code)
+    result = regularized.get(code)
+    if result is None:
+        result = ast.unparse(remove_comments_and_docstrings(ast.parse(code)))
+        regularized.put(code, result)
+        regularized.put(result, result)
+    return result
 
 
 def get_stmt_list(code:str) -> list:
     return code.split('\n')
 
+def get_unique_traces(traces) -> list:
+    # Executed lines in order of first hit, from line hit counts or full traces
+    return list(dict.fromkeys(traces))
+
 def get_indentation(stmt:str) -> int:
     return len(stmt.rstrip()) - len(stmt.strip())
 
@@ -0,0 +1,33 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, maxsize:int=65536):
+        # Least recently used entries are evicted past maxsize
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, key, default=None):
+        if key in self.data.keys():
+            self.hits += 1
+            self.data.move_to_end(key)
+            return self.data[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self.data.pop(key, default)
+
+    def stats(self) -> str:
+        return f'{self.hits} hits, {self.misses} misses'
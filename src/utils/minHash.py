@@ -0,0 +1,47 @@
+import hashlib
+import numpy as np
+
+
+class MinHashLSH:
+    # MinHash signatures of shingle sets, banded so similar sets share a bucket in some band
+    # Hash functions are fixed, signatures do not depend on the process or the random seed
+    prime = (1 << 61) - 1
+
+    def __init__(self, num_perm:int=64, bands:int=16):
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(1)
+        self.a = rng.randint(1, 1 << 31, size=bands*self.rows).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=bands*self.rows).astype(np.uint64)
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+        # Insertion index of each key, ties are broken by it
+        self.order = {}
+
+    def hash(self, shingle) -> int:
+        return int.from_bytes(hashlib.blake2b(repr(shingle).encode(), digest_size=4).digest(), 'little')
+
+    def signature(self, shingles:set) -> np.ndarray:
+        if not shingles:
+            return np.full(len(self.a), self.prime, dtype=np.uint64)
+        hashes = np.array([self.hash(shingle) for shingle in shingles], dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % np.uint64(self.prime)).min(axis=0)
+
+    def get_bands(self, signature:np.ndarray) -> list:
+        return [signature[band*self.rows:(band+1)*self.rows].tobytes() for band in range(self.bands)]
+
+    def insert(self, key, shingles:set):
+        signature = self.signature(shingles)
+        self.signatures[key] = signature
+        self.order.setdefault(key, len(self.order))
+        for buckets, band in zip(self.buckets, self.get_bands(signature)):
+            buckets.setdefault(band, []).append(key)
+
+    def query(self, key, size:int) -> list:
+        # Keys sharing most bands with the key, ties in order of insertion
+        shared = {}
+        for buckets, band in zip(self.buckets, self.get_bands(self.signatures[key])):
+            for other in buckets[band]:
+                if other != key:
+                    shared[other] = shared.get(other, 0) + 1
+        return sorted(shared.keys(), key=lambda other: (-shared[other], self.order[other]))[:size]
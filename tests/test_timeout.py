@@ -0,0 +1,28 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.execution import Tester
+
+
+class TimeoutTest(unittest.TestCase):
+    # A candidate printing the expected output then looping forever is timed out by both runners
+    code = 'n = int(input())\nprint(n)\nwhile n: pass'
+    testcases = [{'testcase_no':1, 'input_tc':'1', 'output_tc':'1'}]
+
+    def get_status(self, sandbox:bool) -> tuple:
+        tester = Tester(self.testcases, timeout=1, sandbox=sandbox)
+        try:
+            return tester.validation(self.code)[1], tester.trace(self.code)[0][1]
+        finally:
+            tester.close()
+
+    def test_hang_after_output(self):
+        self.assertEqual(self.get_status(sandbox=True), ('Timed Out', 'Timed Out'))
+        self.assertEqual(self.get_status(sandbox=False), ('Timed Out', 'Timed Out'))
+
+
+if __name__ == '__main__':
+    unittest.main()